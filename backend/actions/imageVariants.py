@@ -0,0 +1,125 @@
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from schema.Image import Image
+from actions.savedImageIndex import saved_image_index, SAVED_IMAGES_DIR
+from utils.log import get_logger
+
+logger = get_logger('imageVariants')
+
+# Pillow is optional: without it the pool is served as the original JPEGs
+try:
+    from PIL import Image as PILImage, features
+except ImportError:
+    PILImage = None
+
+# Resized variants generated for every pooled image (max width in pixels)
+VARIANT_WIDTHS = {
+    'thumb': 400,
+    'medium': 1080,
+}
+VARIANT_QUALITY = int(os.getenv('ZOLA_VARIANT_QUALITY', '80'))
+VARIANT_WORKERS = int(os.getenv('ZOLA_VARIANT_WORKERS', str(os.cpu_count() or 2)))
+ORIGINAL_FILENAME = 'image.jpg'
+
+def _variant_formats() -> List[str]:
+    if PILImage is None:
+        return []
+    formats = ['webp'] if features.check('webp') else []
+    if features.check('avif'):
+        formats.append('avif')
+    return formats
+
+VARIANT_FORMATS = _variant_formats()
+# Every file name the static endpoint is allowed to serve from an image folder
+SERVABLE_FILES = {ORIGINAL_FILENAME} | {
+    f"{size}.{fmt}" for size in VARIANT_WIDTHS for fmt in VARIANT_FORMATS
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def saved_image_path(image_id: str, filename: str) -> str:
+    return os.path.join(SAVED_IMAGES_DIR, f"image_{image_id}", filename)
+
+def local_image(image: Image, base_url: str) -> Image:
+    """
+    Point a pooled Image at the locally served files instead of Unsplash
+    """
+    original_url = f"{base_url}/saved-images/{image.id}/{ORIGINAL_FILENAME}"
+    thumb_url = f"{base_url}{image.thumbUrl}" if image.thumbUrl else original_url
+    medium_url = f"{base_url}{image.mediumUrl}" if image.mediumUrl else original_url
+    return image.copy(update={'url': medium_url, 'thumbUrl': thumb_url, 'mediumUrl': medium_url})
+
+def generate_variants(image_folder: str) -> Dict[str, str]:
+    """
+    Write every missing resized variant for one pooled image.
+    Runs in a worker process; returns {size: file name} of the primary
+    (first format) variant for each size.
+    """
+    generated = {}
+    source_path = os.path.join(image_folder, ORIGINAL_FILENAME)
+    with PILImage.open(source_path) as source:
+        source = source.convert('RGB')
+        for size, width in VARIANT_WIDTHS.items():
+            resized = None
+            for fmt in VARIANT_FORMATS:
+                filename = f"{size}.{fmt}"
+                path = os.path.join(image_folder, filename)
+                if not os.path.exists(path):
+                    if resized is None:
+                        resized = source.copy()
+                        resized.thumbnail((width, width * 4))
+                    tmp_path = f"{path}.tmp"
+                    resized.save(tmp_path, format=fmt.upper(), quality=VARIANT_QUALITY)
+                    os.replace(tmp_path, path)
+                generated.setdefault(size, filename)
+    return generated
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=VARIANT_WORKERS)
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+async def generate_missing_variants(image_ids: Optional[List[str]] = None) -> int:
+    """
+    Generate variants (in a process pool) for pooled images whose index
+    record has no thumbnail yet, then point those records at the variants.
+    Defaults to the whole pool. Returns the number of images updated.
+    """
+    if not VARIANT_FORMATS:
+        return 0
+    if image_ids is None:
+        image_ids = saved_image_index.ids()
+    pending = [
+        image for image in (saved_image_index.get(image_id) for image_id in image_ids)
+        if image is not None and not image.thumbUrl
+    ]
+    if not pending:
+        return 0
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(_get_executor(), generate_variants, os.path.join(SAVED_IMAGES_DIR, f"image_{image.id}"))
+        for image in pending
+    ], return_exceptions=True)
+
+    updated = []
+    for image, variants in zip(pending, results):
+        if isinstance(variants, BaseException):
+            logger.error("Error generating variants for image %s: %s", image.id, variants)
+            continue
+        updated.append(image.copy(update={
+            'thumbUrl': f"/saved-images/{image.id}/{variants['thumb']}",
+            'mediumUrl': f"/saved-images/{image.id}/{variants['medium']}",
+        }))
+    await asyncio.to_thread(saved_image_index.add, updated)
+    logger.info("Generated variants for %d images", len(updated))
+    return len(updated)
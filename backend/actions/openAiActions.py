@@ -1,88 +1,590 @@
 from schema.Plan import Plan
-from openai import OpenAI
+from openai import AsyncOpenAI, APIStatusError
 from dotenv import load_dotenv
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from utils.cache import PersistentCache, acquire_lease, lease_held, normalize_query, release_lease, renew_lease
+from utils.concurrency import SingleFlight, StreamFlight
+from utils.streaming import ItineraryStreamParser
+from utils.ratelimit import get_scheduler
+from utils.metrics import observe_upstream, upstream_call
+import asyncio
+import hashlib
+import json
 import os
+import time
+from utils.log import get_logger
+
+logger = get_logger('openai')
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv('OPENAI_KEY'))
+async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_KEY'))
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+# Bump whenever itinerary_prompt_template changes so cached itineraries are not reused
+PROMPT_VERSION = "2"
+# Enforce the {"itinerary", "query_keywords"} envelope with a strict JSON schema;
+# set to 0 for models without structured outputs (falls back to JSON mode)
+OPENAI_STRUCTURED_OUTPUT = os.getenv('OPENAI_STRUCTURED_OUTPUT', '1') == '1'
+
+# Completion budget: a fixed part for the keywords and intro plus a share per trip day
+OPENAI_BASE_TOKENS = int(os.getenv('OPENAI_BASE_TOKENS', '400'))
+OPENAI_TOKENS_PER_DAY = int(os.getenv('OPENAI_TOKENS_PER_DAY', '600'))
+OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '8000'))
+# Trip length assumed when the dates can't be parsed
+DEFAULT_TRIP_DAYS = 3
+
+# Trips at least this long are generated as an outline plus concurrent per-day completions
+OPENAI_PARALLEL_MIN_DAYS = int(os.getenv('OPENAI_PARALLEL_MIN_DAYS', '5'))
+OPENAI_DAY_CONCURRENCY = int(os.getenv('OPENAI_DAY_CONCURRENCY', '4'))
+OPENAI_OUTLINE_TOKENS_PER_DAY = 80
+# Longer trips are rejected rather than fanned out into one completion per day
+OPENAI_MAX_DAYS = int(os.getenv('OPENAI_MAX_DAYS', '30'))
+
+ITINERARY_CACHE_TTL = float(os.getenv('ITINERARY_CACHE_TTL', str(24 * 3600)))
+ITINERARY_CACHE_MAX_ENTRIES = int(os.getenv('ITINERARY_CACHE_MAX_ENTRIES', '5000'))
+itinerary_cache = PersistentCache('itinerary', ITINERARY_CACHE_TTL, ITINERARY_CACHE_MAX_ENTRIES)
+# Identical plans generating at the same time share one completion: in this
+# worker through the flights, across workers through a lease in the cache DB
+itinerary_flight = SingleFlight()
+itinerary_stream_flight = StreamFlight()
+# The lease is renewed every third of its TTL while the generation runs, so a
+# long trip can outlast it; the TTL only bounds how long a crashed worker blocks others
+ITINERARY_LEASE_SECONDS = float(os.getenv('ITINERARY_LEASE_SECONDS', '180'))
+ITINERARY_LEASE_POLL_SECONDS = 0.5
+
+def _parse_date(value: str) -> Optional[datetime]:
+    """
+    Parse an ISO 8601 date or timestamp. The frontend sends Date.toISOString()
+    ("2024-06-15T04:00:00.000Z"); fromisoformat only accepts the Z suffix from
+    Python 3.11 on, so it is rewritten as an explicit offset
+    """
+    try:
+        value = value.strip()
+        if value[-1:] in ('Z', 'z'):
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value)
+    except (ValueError, AttributeError):
+        return None
+
+def trip_days(plan: Plan) -> int:
+    """
+    Number of days covered by dateFrom..dateTo, inclusive
+    """
+    date_from, date_to = _parse_date(plan.dateFrom), _parse_date(plan.dateTo)
+    if date_from is None or date_to is None:
+        return DEFAULT_TRIP_DAYS
+    return max(1, (date_to.date() - date_from.date()).days + 1)
+
+def check_trip_length(plan: Plan):
+    """
+    Raise ValueError for trips longer than OPENAI_MAX_DAYS
+    """
+    num_days = trip_days(plan)
+    if num_days > OPENAI_MAX_DAYS:
+        raise ValueError(f"trips can be at most {OPENAI_MAX_DAYS} days long (got {num_days})")
+
+def itinerary_token_budget(plan: Plan) -> int:
+    return min(OPENAI_MAX_TOKENS, OPENAI_BASE_TOKENS + OPENAI_TOKENS_PER_DAY * trip_days(plan))
+
+KEYWORDS_PROPERTY = {
+    "type": "array",
+    "items": {"type": "string"},
+    "description": "TripAdvisor search terms for places in the itinerary",
+}
+
+def json_response_format(name: str, properties: dict) -> dict:
+    """
+    Strict json_schema response_format for an object with exactly these
+    properties, or plain JSON mode when structured outputs are disabled
+    """
+    if not OPENAI_STRUCTURED_OUTPUT:
+        return {"type": "json_object"}
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+def itinerary_response_format(keywords_first: bool = False) -> dict:
+    """
+    response_format for the itinerary envelope. Structured outputs generate
+    properties in schema order, so keywords_first puts query_keywords first.
+    """
+    properties = {
+        "itinerary": {"type": "string", "description": "The itinerary in Markdown"},
+        "query_keywords": KEYWORDS_PROPERTY,
+    }
+    if keywords_first:
+        properties = {key: properties[key] for key in ("query_keywords", "itinerary")}
+    return json_response_format("itinerary", properties)
+
+OUTLINE_RESPONSE_FORMAT = json_response_format("itinerary_outline", {
+    "query_keywords": KEYWORDS_PROPERTY,
+    "intro": {"type": "string", "description": "One or two Markdown sentences introducing the trip"},
+    "days": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "theme": {"type": "string"},
+                "areas": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["theme", "areas"],
+            "additionalProperties": False,
+        },
+    },
+})
+
+DAY_RESPONSE_FORMAT = json_response_format("itinerary_day", {
+    "query_keywords": KEYWORDS_PROPERTY,
+    "markdown": {"type": "string", "description": "This day's section of the itinerary in Markdown"},
+})
+
+def _add_keywords(keywords: List[str], seen: set, new_keywords: List[str]) -> List[str]:
+    """
+    Append the keywords not seen yet (compared normalized) and return them
+    """
+    added = []
+    for keyword in new_keywords:
+        normalized = normalize_query(keyword)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            keywords.append(keyword)
+            added.append(keyword)
+    return added
+
+def plan_cache_key(plan: Plan) -> str:
+    """
+    Content hash of a Plan: fields are canonicalized so that cosmetic
+    differences (case, spacing, time of day) map to the same itinerary
+    """
+    def text(value: str) -> str:
+        return ' '.join(str(value).split()).casefold()
+
+    def date(value: str) -> str:
+        parsed = _parse_date(value)
+        return parsed.date().isoformat() if parsed else text(value)
+
+    canonical = {
+        'dateFrom': date(plan.dateFrom),
+        'dateTo': date(plan.dateTo),
+        'location': text(plan.location),
+        'numPeople': plan.numPeople,
+        'budget': text(plan.budget),
+        'mood': text(plan.mood),
+        'prompt_version': PROMPT_VERSION,
+        'model': OPENAI_MODEL,
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
 
 class OpenAiActions:
     @staticmethod
-    def createItinerary(plan: Plan) -> str:
-        # Use the existing prompt logic
+    @observe_upstream
+    async def createItinerary(plan: Plan, use_cache: bool = True) -> str:
+        check_trip_length(plan)
+        cache_key = plan_cache_key(plan)
+        if use_cache:
+            cached = itinerary_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Itinerary cache hit for %s", plan.location)
+                return cached
+
+        # Identical plans requested while one is generating share its result
+        return await itinerary_flight.do(cache_key, lambda: OpenAiActions._create_once(plan, cache_key))
+
+    @staticmethod
+    @observe_upstream
+    async def streamItinerary(plan: Plan, use_cache: bool = True, keywords_first: bool = False) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Stream an itinerary as it is generated. With keywords_first the model is
+        asked to write query_keywords before the itinerary. Yields (event, data) pairs:
+          ("itinerary", markdown chunk) - complete markdown blocks in order
+          ("keyword", keyword)          - each query keyword as soon as it is parsed
+          ("keywords", [keywords])      - the final keyword list, once generation is done
+        Concurrent identical requests in this worker share one generation and
+        each get the full stream.
+        """
+        check_trip_length(plan)
+        cache_key = plan_cache_key(plan)
+        if use_cache:
+            cached = itinerary_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Itinerary cache hit for %s", plan.location)
+                async for event in OpenAiActions._replay(cached):
+                    yield event
+                return
+
+        flight_key = f"{cache_key}:{int(keywords_first)}"
+        async for event in itinerary_stream_flight.stream(
+            flight_key, lambda: OpenAiActions._stream_once(plan, cache_key, keywords_first)
+        ):
+            yield event
+
+    @staticmethod
+    async def _replay(cached: str) -> AsyncIterator[Tuple[str, object]]:
+        """
+        The events of streamItinerary for an already generated itinerary
+        """
+        envelope = json.loads(cached)
+        yield "itinerary", envelope.get("itinerary", "")
+        for keyword in envelope.get("query_keywords", []):
+            yield "keyword", keyword
+        yield "keywords", envelope.get("query_keywords", [])
+
+    @staticmethod
+    async def _wait_for_other_worker(cache_key: str, since: float) -> Optional[str]:
+        """
+        Another worker holds the generation lease for this plan: poll the
+        shared cache for its result until the lease is released or expires
+        """
+        lease_key = f"itinerary:{cache_key}"
+        while lease_held(lease_key):
+            await asyncio.sleep(ITINERARY_LEASE_POLL_SECONDS)
+            cached = itinerary_cache.get(cache_key, stored_after=since)
+            if cached is not None:
+                return cached
+        return itinerary_cache.get(cache_key, stored_after=since)
+
+    @staticmethod
+    async def _renew_lease(lease_key: str, token: str):
+        """
+        Keep the generation lease alive until cancelled
+        """
+        while True:
+            await asyncio.sleep(ITINERARY_LEASE_SECONDS / 3)
+            if not renew_lease(lease_key, token, ITINERARY_LEASE_SECONDS):
+                logger.warning("Lost the itinerary lease %s", lease_key)
+                return
+
+    @staticmethod
+    async def _create_once(plan: Plan, cache_key: str) -> str:
+        """
+        Generate the itinerary unless another worker already is, in which case
+        wait for the result it caches
+        """
+        lease_key = f"itinerary:{cache_key}"
+        started = time.time()
+        token = acquire_lease(lease_key, ITINERARY_LEASE_SECONDS)
+        if token is None:
+            logger.debug("Waiting for another worker's itinerary for %s", plan.location)
+            cached = await OpenAiActions._wait_for_other_worker(cache_key, started)
+            if cached is not None:
+                return cached
+            token = acquire_lease(lease_key, ITINERARY_LEASE_SECONDS)
+        renewer = asyncio.ensure_future(OpenAiActions._renew_lease(lease_key, token)) if token else None
+        try:
+            return await OpenAiActions._generate(plan, cache_key)
+        finally:
+            if token is not None:
+                renewer.cancel()
+                release_lease(lease_key, token)
+
+    @staticmethod
+    async def _stream_once(plan: Plan, cache_key: str, keywords_first: bool) -> AsyncIterator[Tuple[str, object]]:
+        """
+        _create_once for streams: a generation running in another worker
+        can't be streamed from here, so its cached result is replayed
+        """
+        lease_key = f"itinerary:{cache_key}"
+        started = time.time()
+        token = acquire_lease(lease_key, ITINERARY_LEASE_SECONDS)
+        if token is None:
+            logger.debug("Waiting for another worker's itinerary for %s", plan.location)
+            cached = await OpenAiActions._wait_for_other_worker(cache_key, started)
+            if cached is not None:
+                async for event in OpenAiActions._replay(cached):
+                    yield event
+                return
+            token = acquire_lease(lease_key, ITINERARY_LEASE_SECONDS)
+        renewer = asyncio.ensure_future(OpenAiActions._renew_lease(lease_key, token)) if token else None
+        try:
+            async for event in OpenAiActions._stream(plan, cache_key, keywords_first):
+                yield event
+        finally:
+            if token is not None:
+                renewer.cancel()
+                release_lease(lease_key, token)
+
+    @staticmethod
+    async def _generate(plan: Plan, cache_key: str) -> str:
+        if trip_days(plan) >= OPENAI_PARALLEL_MIN_DAYS:
+            itinerary, keywords = [], []
+            async for event, data in OpenAiActions._generate_by_day(plan):
+                (itinerary if event == "itinerary" else keywords).append(data)
+            content = json.dumps({"itinerary": "".join(itinerary), "query_keywords": keywords})
+            itinerary_cache.set(cache_key, content)
+            return content
+
+        prompt = OpenAiActions._build_prompt(plan)
+        max_tokens = itinerary_token_budget(plan)
+        
+        # Make actual OpenAI API call
+        response = await OpenAiActions._create_completion(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            response_format=itinerary_response_format()
+        )
+        choice = response.choices[0]
+        if choice.finish_reason == "length" and max_tokens < OPENAI_MAX_TOKENS:
+            # A truncated envelope is not valid JSON; retry once with the full budget
+            logger.warning("Itinerary for %s hit the %d token budget, retrying", plan.location, max_tokens)
+            response = await OpenAiActions._create_completion(
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=OPENAI_MAX_TOKENS,
+                response_format=itinerary_response_format()
+            )
+            choice = response.choices[0]
+        if getattr(choice.message, "refusal", None):
+            raise ValueError(f"itinerary request refused: {choice.message.refusal}")
+        
+        content = choice.message.content
+        # Only cache completions the endpoint can actually parse
+        try:
+            json.loads(content)
+            itinerary_cache.set(cache_key, content)
+        except (TypeError, ValueError):
+            pass
+        return content
+
+    @staticmethod
+    async def _stream(plan: Plan, cache_key: str, keywords_first: bool) -> AsyncIterator[Tuple[str, object]]:
+        if trip_days(plan) >= OPENAI_PARALLEL_MIN_DAYS:
+            # Outline keywords always come first in this mode
+            itinerary, keywords = [], []
+            async for event, data in OpenAiActions._generate_by_day(plan):
+                (itinerary if event == "itinerary" else keywords).append(data)
+                yield event, data
+            itinerary_cache.set(cache_key, json.dumps({"itinerary": "".join(itinerary), "query_keywords": keywords}))
+            yield "keywords", keywords
+            return
+
+        stream = await OpenAiActions._create_completion(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "user", "content": OpenAiActions._build_prompt(plan, keywords_first)}
+            ],
+            max_tokens=itinerary_token_budget(plan),
+            response_format=itinerary_response_format(keywords_first),
+            stream=True
+        )
+        parser = ItineraryStreamParser()
+        finish_reason = None
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            if not chunk.choices[0].delta.content:
+                continue
+            for event in parser.feed(chunk.choices[0].delta.content):
+                yield event
+        for event in parser.close():
+            yield event
+
+        envelope = parser.result
+        # A stream cut off at max_tokens still yields recovered markdown;
+        # only a complete envelope is cached and replayed to later requests
+        if finish_reason != "length" and parser.parsed() is not None and envelope.get("itinerary"):
+            itinerary_cache.set(cache_key, json.dumps(envelope))
+        else:
+            logger.warning("Itinerary stream ended incomplete (finish_reason=%s); not cached", finish_reason)
+        yield "keywords", envelope.get("query_keywords", [])
+
+    @staticmethod
+    async def _generate_by_day(plan: Plan) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Long-trip mode: a short outline completion, then one completion per
+        day, OPENAI_DAY_CONCURRENCY at a time. Yields ("keyword", keyword) for
+        every new (deduplicated) keyword and ("itinerary", markdown) for the
+        intro and then each day in order, as soon as it and all earlier days
+        are done.
+        """
+        num_days = trip_days(plan)
+        outline = await OpenAiActions._generate_outline(plan, num_days)
+        keywords, seen = [], set()
+        for keyword in _add_keywords(keywords, seen, outline.get("query_keywords", [])):
+            yield "keyword", keyword
+        intro = outline.get("intro", "").strip()
+        if intro:
+            yield "itinerary", intro + "\n\n"
+
+        days = outline.get("days", [])[:num_days]
+        days += [{"theme": "", "areas": []}] * (num_days - len(days))
+        semaphore = asyncio.Semaphore(OPENAI_DAY_CONCURRENCY)
+
+        async def generate_day(number: int) -> dict:
+            async with semaphore:
+                return await OpenAiActions._generate_day(plan, number, days)
+
+        tasks = [asyncio.ensure_future(generate_day(number)) for number in range(1, num_days + 1)]
+        try:
+            for task in tasks:
+                section = await task
+                for keyword in _add_keywords(keywords, seen, section.get("query_keywords", [])):
+                    yield "keyword", keyword
+                yield "itinerary", section.get("markdown", "").strip() + "\n\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    @observe_upstream
+    async def _generate_outline(plan: Plan, num_days: int) -> dict:
+        prompt = outline_prompt_template(
+            date=f"{plan.dateFrom} to {plan.dateTo}",
+            location=plan.location,
+            num_people=plan.numPeople,
+            mood=plan.mood,
+            num_days=num_days
+        )
+        return await OpenAiActions._create_json_completion(
+            prompt, OUTLINE_RESPONSE_FORMAT,
+            min(OPENAI_MAX_TOKENS, OPENAI_BASE_TOKENS + OPENAI_OUTLINE_TOKENS_PER_DAY * num_days)
+        )
+
+    @staticmethod
+    @observe_upstream
+    async def _generate_day(plan: Plan, number: int, days: List[dict]) -> dict:
+        prompt = day_prompt_template(
+            location=plan.location,
+            num_people=plan.numPeople,
+            mood=plan.mood,
+            number=number,
+            days=days
+        )
+        return await OpenAiActions._create_json_completion(
+            prompt, DAY_RESPONSE_FORMAT, OPENAI_BASE_TOKENS + OPENAI_TOKENS_PER_DAY
+        )
+
+    @staticmethod
+    async def _create_json_completion(prompt: str, response_format: dict, max_tokens: int) -> dict:
+        """
+        One JSON completion, retried once with OPENAI_MAX_TOKENS if it is cut
+        off at max_tokens (a truncated object can't be parsed)
+        """
+        for budget in (max_tokens, OPENAI_MAX_TOKENS):
+            response = await OpenAiActions._create_completion(
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=budget,
+                response_format=response_format
+            )
+            choice = response.choices[0]
+            if choice.finish_reason != "length" or budget >= OPENAI_MAX_TOKENS:
+                break
+            logger.warning("Itinerary section hit the %d token budget, retrying", budget)
+        message = choice.message
+        if getattr(message, "refusal", None):
+            raise ValueError(f"itinerary request refused: {message.refusal}")
+        if choice.finish_reason == "length":
+            raise ValueError(f"itinerary section did not fit in {OPENAI_MAX_TOKENS} tokens")
+        return json.loads(message.content)
+
+    @staticmethod
+    async def _create_completion(**kwargs):
+        """
+        Chat completion through the OpenAI rate-limit scheduler; the response's
+        x-ratelimit-* headers (or a 429) are fed back into it. For streams the
+        recorded upstream latency ends when the response headers arrive.
+        """
+        scheduler = get_scheduler('openai')
+        async with upstream_call('openai') as call:
+            await scheduler.acquire()
+            try:
+                raw_response = await async_client.chat.completions.with_raw_response.create(**kwargs)
+            except APIStatusError as e:
+                scheduler.update_from_response(e.status_code, e.response.headers)
+                raise
+            call.status = raw_response.status_code
+        scheduler.update_from_response(raw_response.status_code, raw_response.headers)
+        return raw_response.parse()
+
+    @staticmethod
+    def _build_prompt(plan: Plan, keywords_first: bool = False) -> str:
         date_range = f"{plan.dateFrom} to {plan.dateTo}"
         alt_texts = []  # You can populate this with additional ideas if needed
         
-        prompt = itinerary_prompt_template(
+        return itinerary_prompt_template(
             date=date_range,
             location=plan.location,
             num_people=plan.numPeople,
             mood=plan.mood,
-            alt_texts=alt_texts
+            alt_texts=alt_texts,
+            keywords_first=keywords_first,
+            num_days=trip_days(plan)
         )
-        
-        # Make actual OpenAI API call
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=3000,  # give enough room for the response
-            
-            # response_format={"type": "json_object"}  # 👈 This forces valid JSON
-        )
-        
-        return response.choices[0].message.content
 
-def itinerary_prompt_template(date, location, num_people, mood, alt_texts):
+def itinerary_prompt_template(date, location, num_people, mood, alt_texts, keywords_first=False, num_days=None):
 
     alt_text_md = "\n".join([f"- {text}" for text in alt_texts])
+    days = f" ({num_days} day{'s' if num_days != 1 else ''})" if num_days else ""
+    # With structured outputs the schema fixes the field order; this covers JSON mode
+    order = "query_keywords first, then itinerary" if keywords_first else "itinerary, then query_keywords"
 
-    prompt = f"""
-You are a professional travel event planner with expertise in creating personalized, immersive travel experiences. Your goal is to create a detailed, day-by-day travel itinerary in Markdown format that is visually appealing, easy to follow, and tailored to the traveler's preferences.
+    prompt = f"""You are an expert travel planner. Write a personalized, practical day-by-day travel itinerary in Markdown.
 
-Trip Details:
-- Date: {date}
+Trip:
+- Dates: {date}{days}
 - Location: {location}
-- Number of People: {num_people}
+- People: {num_people}
 - Mood: {mood}
-- Additional Ideas: {alt_text_md}
+- Ideas: {alt_text_md}
 
-Requirements:
-- Organize the itinerary by day and time, considering travel time between locations.
-- Recommend restaurants, bars, cafes, and local dining spots.
-- Suggest activities, attractions, and highlights that align with the mood.
-- Include local tips, best times to visit, and insider knowledge.
-- Use headings and subheadings to structure the itinerary clearly in Markdown.
-- Make the itinerary engaging, fun, and practical for travelers.
+Itinerary:
+- One "### Day N – [Date]" section per day with **Morning:**, **Afternoon:** and **Evening:** bullet lists.
+- Order activities by time, accounting for travel between places.
+- Recommend restaurants, bars, cafes and local dining, plus activities and attractions that fit the mood.
+- Add short local tips, best times to visit and insider knowledge.
 
-Format Output Example:
+query_keywords: TripAdvisor search terms for places in the itinerary (the city, attractions, restaurants, hotels).
 
-### Day 1 – [Date]
-**Morning:**  
-- Activity / Location (include tips or notes)  
-- Cafe / Breakfast spot
+Answer with a JSON object with the fields {order}: "itinerary" (Markdown string) and "query_keywords" (list of strings)."""
+    return prompt
+
+def outline_prompt_template(date, location, num_people, mood, num_days):
+
+    prompt = f"""You are an expert travel planner. Outline a {num_days}-day trip; each day will be written up separately.
+
+Trip:
+- Dates: {date}
+- Location: {location}
+- People: {num_people}
+- Mood: {mood}
 
-**Afternoon:**  
-- Activity / Lunch spot  
+Answer with a JSON object:
+- "query_keywords": TripAdvisor search terms for the destination (the city, its main areas and landmarks)
+- "intro": one or two Markdown sentences introducing the trip
+- "days": exactly {num_days} entries in order, each with a short "theme" and the neighbourhoods or landmarks it covers ("areas"). Spread highlights across days without repeats."""
+    return prompt
 
-**Evening:**  
-- Activity / Dinner spot  
-- Optional nightlife or local experience
+def day_prompt_template(location, num_people, mood, number, days):
 
-Repeat for each day of the trip.
+    outline_md = "\n".join([
+        f"- Day {index}: {day.get('theme', '')} ({', '.join(day.get('areas', []))})"
+        for index, day in enumerate(days, start=1)
+    ])
 
-Finally, you should generate a list of relevant query keywords, which will be search in TripAdvisor to get more details about the itinerary.
-Example includes name of the city, attractions, restaurants, hotels, etc.
+    prompt = f"""You are an expert travel planner writing one day of a {len(days)}-day itinerary for {num_people} people in {location}. Mood: {mood}.
 
-output your entire response in the folowing json format:
+Trip outline:
+{outline_md}
 
-{{
-    "itinerary": (str) "markdown format of the itinerary",
-    "query_keywords": (list) "list of query keywords used to generate the itinerary"
-}}
-THE QUERY KEYWORDS SHOULD BE A FIELD IN THE JSON OBJECT, not in the markdown format
-the string should be valid json that can be parsed by json.loads()
+Write only Day {number} as Markdown, starting with "### Day {number}", with **Morning:**, **Afternoon:** and **Evening:** bullet lists. Stay within this day's theme and areas, order activities by time accounting for travel, recommend restaurants, bars and cafes, and add short local tips.
 
-"""
-    return prompt
\ No newline at end of file
+Answer with a JSON object: "query_keywords" (TripAdvisor search terms for the places you recommend) and "markdown" (the day's section)."""
+    return prompt
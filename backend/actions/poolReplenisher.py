@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+from typing import Optional
+from actions.unsplashActions import UnsplashAction
+from actions.savedImageIndex import saved_image_index, SAVED_IMAGES_DIR
+from actions.imageVariants import generate_missing_variants
+from utils.ratelimit import request_priority, BACKGROUND
+from utils.log import get_logger
+
+logger = get_logger('poolReplenisher')
+
+# fcntl is POSIX-only; without it every worker runs its own replenisher
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+POOL_TARGET = int(os.getenv('ZOLA_POOL_TARGET', '150'))
+POOL_REFRESH_SECONDS = float(os.getenv('ZOLA_POOL_REFRESH_SECONDS', '3600'))
+# Images older than POOL_MAX_AGE_SECONDS are rotated out, at most POOL_ROTATE_COUNT per cycle
+POOL_MAX_AGE_SECONDS = float(os.getenv('ZOLA_POOL_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+POOL_ROTATE_COUNT = int(os.getenv('ZOLA_POOL_ROTATE_COUNT', '15'))
+LOCK_PATH = os.path.join(SAVED_IMAGES_DIR, '.replenisher.lock')
+
+def _acquire_lock() -> Optional[object]:
+    """
+    Take a non-blocking node-wide lock so only one uvicorn worker replenishes.
+    Returns the open lock file, or None if another worker holds it.
+    """
+    os.makedirs(SAVED_IMAGES_DIR, exist_ok=True)
+    lock_file = open(LOCK_PATH, 'w')
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except OSError:
+        lock_file.close()
+        return None
+
+def _saved_at(image_id: str) -> Optional[float]:
+    """
+    When a pooled image was downloaded: savedAt in its metadata.json (which
+    is rewritten when tags are added), else the original file's mtime
+    """
+    image_folder = os.path.join(SAVED_IMAGES_DIR, f"image_{image_id}")
+    try:
+        with open(os.path.join(image_folder, 'metadata.json'), 'r') as f:
+            saved_at = json.load(f).get('savedAt')
+        if saved_at is not None:
+            return float(saved_at)
+        return os.stat(os.path.join(image_folder, 'image.jpg')).st_mtime
+    except (OSError, ValueError, TypeError):
+        return None
+
+def _stale_image_ids() -> list:
+    """
+    IDs of the oldest pooled images past the max age, up to the rotation count
+    """
+    cutoff = time.time() - POOL_MAX_AGE_SECONDS
+    ages = []
+    for image_id in saved_image_index.ids():
+        saved_at = _saved_at(image_id)
+        if saved_at is not None and saved_at < cutoff:
+            ages.append((saved_at, image_id))
+    return [image_id for _, image_id in sorted(ages)[:POOL_ROTATE_COUNT]]
+
+def rotate_stale_images() -> int:
+    """
+    Drop stale images from the index first (so they stop being served),
+    then delete their folders. Returns the number of images removed.
+    """
+    stale_ids = _stale_image_ids()
+    if not stale_ids:
+        return 0
+    saved_image_index.remove(stale_ids)
+    for image_id in stale_ids:
+        shutil.rmtree(os.path.join(SAVED_IMAGES_DIR, f"image_{image_id}"), ignore_errors=True)
+    logger.info("Rotated out %d stale images", len(stale_ids))
+    return len(stale_ids)
+
+async def run_replenisher():
+    """
+    Keep the saved image pool topped up to POOL_TARGET in the background,
+    rotating stale images out every POOL_REFRESH_SECONDS. Also resizes any
+    pooled images that have no variants yet.
+    """
+    # Pool upkeep always yields upstream quota to interactive requests
+    request_priority.set(BACKGROUND)
+    lock_file = await asyncio.to_thread(_acquire_lock)
+    if lock_file is None:
+        logger.info("Image pool replenisher already running in another worker")
+        return
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(rotate_stale_images)
+                await UnsplashAction.save_images(POOL_TARGET)
+                await generate_missing_variants()
+            except Exception as e:
+                logger.exception("Error replenishing image pool: %s", e)
+            await asyncio.sleep(POOL_REFRESH_SECONDS)
+    finally:
+        lock_file.close()
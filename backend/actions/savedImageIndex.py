@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from schema.Image import Image
+from utils.log import get_logger
+
+logger = get_logger('savedImageIndex')
+
+# fcntl is POSIX-only; without it manifest updates are only serialized within a worker
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SAVED_IMAGES_DIR = os.getenv('ZOLA_SAVED_IMAGES_DIR', os.path.join(os.path.dirname(__file__), '..', 'saved_images'))
+MANIFEST_PATH = os.path.join(SAVED_IMAGES_DIR, 'manifest.json')
+# How often (seconds) to check whether another worker rewrote the manifest
+INDEX_REFRESH_SECONDS = float(os.getenv('ZOLA_IMAGE_INDEX_REFRESH', '5'))
+
+class SavedImageIndex:
+    """
+    In-memory index of every Image in the saved_images pool.
+
+    The pool is described by a single manifest.json, loaded once and
+    reloaded on a background thread when another worker replaces it, so
+    sampling a page of random images never reads the manifest on the
+    request path. Updates re-read the manifest under a cross-worker file
+    lock before writing, so concurrent writers merge instead of
+    overwriting each other. Each image_<id>/metadata.json remains the
+    source of truth and is used to rebuild a missing manifest.
+    """
+    def __init__(self, images_dir: str = SAVED_IMAGES_DIR, manifest_path: str = MANIFEST_PATH):
+        self.images_dir = images_dir
+        self.manifest_path = manifest_path
+        self.lock_path = os.path.join(images_dir, '.manifest.lock')
+        # Replaced as a whole, never mutated, so readers need no lock
+        self._by_id: Dict[str, Image] = {}
+        self._images: List[Image] = []
+        self._manifest_version: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._loaded = False
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def _set_images(self, images: Iterable[Image]):
+        by_id: Dict[str, Image] = {}
+        for image in images:
+            by_id.setdefault(image.id, image)
+        self._by_id = by_id
+        self._images = list(by_id.values())
+
+    def _version(self) -> Optional[Tuple[int, int]]:
+        # The manifest is replaced with os.replace, so every write gets a new inode
+        try:
+            stat_result = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return stat_result.st_ino, stat_result.st_mtime_ns
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Exclusive lock shared by every worker on this node, held while the
+        manifest is read, merged and rewritten
+        """
+        os.makedirs(self.images_dir, exist_ok=True)
+        with open(self.lock_path, 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_manifest(self) -> List[Image]:
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        return [Image(**metadata) for metadata in manifest.get('images', [])]
+
+    def load(self):
+        """
+        Load the manifest, or rebuild it from the image folders if it is missing
+        """
+        with self._lock:
+            try:
+                version = self._version()
+                self._set_images(self._read_manifest())
+                self._manifest_version = version
+            except FileNotFoundError:
+                with self._file_lock():
+                    self._rebuild()
+            except Exception as e:
+                logger.warning("Error loading image manifest, rebuilding: %s", e)
+                with self._file_lock():
+                    self._rebuild()
+            self._loaded = True
+            self._checked_at = time.monotonic()
+        logger.info("Indexed %d saved images", len(self._images))
+
+    def _rebuild(self):
+        images = []
+        if os.path.exists(self.images_dir):
+            for folder in os.listdir(self.images_dir):
+                if not folder.startswith('image_'):
+                    continue
+                metadata_path = os.path.join(self.images_dir, folder, 'metadata.json')
+                try:
+                    with open(metadata_path, 'r') as f:
+                        images.append(Image(**json.load(f)))
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    logger.error("Error loading image from %s: %s", folder, e)
+        self._set_images(images)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        """
+        Atomically replace manifest.json with the current index
+        """
+        os.makedirs(self.images_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'images': [image.dict() for image in self._images]}, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_version = self._version()
+
+    def _update(self, change: Callable[[Dict[str, Image]], bool]):
+        """
+        Apply change to the latest manifest on disk (not this worker's
+        possibly stale copy) and write it back, all under the file lock.
+        change edits the dict in place and returns False if nothing changed.
+        """
+        with self._lock, self._file_lock():
+            if self._version() != self._manifest_version:
+                try:
+                    self._set_images(self._read_manifest())
+                    self._manifest_version = self._version()
+                except FileNotFoundError:
+                    pass
+            by_id = dict(self._by_id)
+            if change(by_id):
+                self._set_images(by_id.values())
+                self._write_manifest()
+
+    def _reload_in_background(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.warning("Error reloading image manifest: %s", e)
+        finally:
+            self._reloading = False
+
+    def _refresh_if_changed(self):
+        if not self._loaded:
+            self.load()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < INDEX_REFRESH_SECONDS or self._reloading:
+            return
+        self._checked_at = now
+        if self._version() != self._manifest_version:
+            # Keep serving the current snapshot while the new one is parsed
+            self._reloading = True
+            threading.Thread(target=self._reload_in_background, name='zola-index-reload', daemon=True).start()
+
+    def sample(self, count: int) -> List[Image]:
+        """
+        Return up to count random images from the pool
+        """
+        self._refresh_if_changed()
+        images = self._images
+        return random.sample(images, min(count, len(images)))
+
+    def count(self) -> int:
+        self._refresh_if_changed()
+        return len(self._images)
+
+    def ids(self) -> List[str]:
+        self._refresh_if_changed()
+        return list(self._by_id)
+
+    def get(self, image_id: str) -> Optional[Image]:
+        self._refresh_if_changed()
+        return self._by_id.get(image_id)
+
+    def add(self, images: List[Image]):
+        """
+        Add (or replace) images in the index and persist the manifest.
+        Blocking; call it from a worker thread in async code.
+        """
+        if not images:
+            return
+        def change(by_id: Dict[str, Image]) -> bool:
+            for image in images:
+                by_id[image.id] = image
+            return True
+        self._update(change)
+
+    def remove(self, image_ids: Iterable[str]):
+        """
+        Drop images from the index and persist the manifest.
+        Blocking; call it from a worker thread in async code.
+        """
+        image_ids = set(image_ids)
+        def change(by_id: Dict[str, Image]) -> bool:
+            removed = image_ids & by_id.keys()
+            for image_id in removed:
+                del by_id[image_id]
+            return bool(removed)
+        self._update(change)
+
+saved_image_index = SavedImageIndex()
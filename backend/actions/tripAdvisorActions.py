@@ -1,21 +1,49 @@
-from turtle import st
-import requests
+import asyncio
 import dotenv 
 import os
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Set
 from schema.Location import Location
+from utils.http import scheduled_get
+from utils.cache import PersistentCache, TTLCache, normalize_query, unique_queries
+from utils.metrics import observe_upstream
+from utils.log import get_logger, log_sampled
+
+logger = get_logger('tripadvisor')
 
 dotenv.load_dotenv(os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
 tripadvisor_key = os.getenv("TRIPADVISOR_KEY")
+TRIPADVISOR_API_URL = os.getenv("TRIPADVISOR_API_URL", "https://api.content.tripadvisor.com/api/v1")
+# Maximum number of TripAdvisor requests in flight at once (per worker)
+TRIPADVISOR_MAX_CONCURRENCY = int(os.getenv("TRIPADVISOR_MAX_CONCURRENCY", "10"))
+
+# Location details change rarely; photo URLs are signed CDN links and expire sooner.
+# Locations without photos are cached too, as "", so they are not asked for again
+TRIPADVISOR_DETAILS_TTL = float(os.getenv("TRIPADVISOR_DETAILS_TTL", str(7 * 24 * 3600)))
+TRIPADVISOR_PHOTO_TTL = float(os.getenv("TRIPADVISOR_PHOTO_TTL", str(24 * 3600)))
+TRIPADVISOR_CACHE_MAX_ENTRIES = int(os.getenv("TRIPADVISOR_CACHE_MAX_ENTRIES", "20000"))
+
+details_cache = PersistentCache("tripadvisor_details", TRIPADVISOR_DETAILS_TTL, TRIPADVISOR_CACHE_MAX_ENTRIES)
+photo_cache = PersistentCache("tripadvisor_photos", TRIPADVISOR_PHOTO_TTL, TRIPADVISOR_CACHE_MAX_ENTRIES)
+# Normalized search query -> ordered list of location IDs
+TRIPADVISOR_SEARCH_TTL = float(os.getenv("TRIPADVISOR_SEARCH_TTL", str(6 * 3600)))
+search_cache = TTLCache(int(os.getenv("TRIPADVISOR_SEARCH_CACHE_SIZE", "2048")), TRIPADVISOR_SEARCH_TTL, name="tripadvisor_search")
+
+_semaphore: Optional[asyncio.Semaphore] = None
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(TRIPADVISOR_MAX_CONCURRENCY)
+    return _semaphore
 
 class TripAdvisorAction:
     @staticmethod
-    def _parse_location_response(response: dict) -> Location:
+    def _parse_location_response(response: dict, photo_url: Optional[str] = None) -> Location:
         """
         Parse TripAdvisor API response into Location object
         """
         try:
-            print(response)
+            log_sampled(logger, "TripAdvisor location details", response, location_id=response.get('location_id'))
             # Extract basic information
             location_id = str(response.get('location_id', ''))
             name = response.get('name', '')
@@ -71,9 +99,6 @@ class TripAdvisorAction:
             # Extract web URL
             web_url = response.get('web_url', None)
             
-            # Extract photo URL - need to construct from photo_count and see_all_photos
-            photo_url = TripAdvisorAction._get_location_image(location_id)
-            
             # Extract price level - not present in this attraction, but might be in restaurants/hotels
             price_level = None
             if 'price_level' in response:
@@ -97,7 +122,7 @@ class TripAdvisorAction:
                 photo_url=photo_url
             )
         except Exception as e:
-            print(f"Error parsing location response: {e}")
+            logger.error("Error parsing location response: %s", e)
             # Return a minimal Location object if parsing fails
             return Location(
                 location_id=str(response.get('location_id', '')),
@@ -106,55 +131,237 @@ class TripAdvisorAction:
             )
 
     @staticmethod
-    def get_locations(query: str) -> tuple[List[Location], List[Location], List[Location]]:
-        """
-        Prepare itinerary by fetching and parsing locations from TripAdvisor
-        Returns tuple of (activities, restaurants, hotels) as Location objects
-        """
-        activities = []
-        
-        # Get activities/attractions
-        activities_response = TripAdvisorAction._get_location_by_query(query)
-        for location in activities_response:
-            id = location['location_id']
-            response = TripAdvisorAction._get_location_details(id)
-            parsed_location = TripAdvisorAction._parse_location_response(response)
-            activities.append(parsed_location)
-        return activities
+    async def get_locations(query: str) -> List[Location]:
+        """
+        Fetch and parse locations from TripAdvisor for a search query.
+        Details and photos for every search result are fetched concurrently.
+        """
+        return await TripAdvisorAction.get_locations_for_queries([query])
+
+    @staticmethod
+    async def get_locations_for_queries(queries: List[str], include_photos: bool = True) -> List[Location]:
+        """
+        Run every search query concurrently, merge the results by location_id
+        and fetch details/photos once per unique location.
+        Locations are returned in query order, then search-rank order.
+        Without include_photos only already-cached photo URLs are filled in;
+        the rest can be resolved later with get_location_photos().
+        """
+        # Keywords that only differ in case/punctuation are searched once
+        queries = unique_queries(queries)
+        searches = await asyncio.gather(*[
+            TripAdvisorAction._get_location_by_query(query) for query in queries
+        ], return_exceptions=True)
+
+        location_ids = []
+        seen_ids = set()
+        for query, results in zip(queries, searches):
+            if isinstance(results, BaseException):
+                logger.warning("Error fetching locations for query '%s': %s", query, results)
+                continue
+            for location_id in results:
+                if location_id not in seen_ids:
+                    seen_ids.add(location_id)
+                    location_ids.append(location_id)
+
+        fetched = await asyncio.gather(*[
+            TripAdvisorAction._get_location(location_id, include_photos) for location_id in location_ids
+        ], return_exceptions=True)
+
+        locations = []
+        for location_id, location in zip(location_ids, fetched):
+            if isinstance(location, BaseException):
+                logger.warning("Error fetching location %s: %s", location_id, location)
+                continue
+            locations.append(location)
+        return locations
+
+    @staticmethod
+    async def iter_locations(query: str, seen_ids: Optional[Set[str]] = None, include_photos: bool = True) -> AsyncIterator[Location]:
+        """
+        Yield the locations for a search query as soon as each one is fetched.
+        IDs already in seen_ids are skipped; seen_ids is updated in place so
+        callers can share it across queries.
+        """
+        if seen_ids is None:
+            seen_ids = set()
+        location_ids = [
+            location_id for location_id in await TripAdvisorAction._get_location_by_query(query)
+            if location_id not in seen_ids
+        ]
+        seen_ids.update(location_ids)
+
+        tasks = [
+            asyncio.ensure_future(TripAdvisorAction._get_location(location_id, include_photos))
+            for location_id in location_ids
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    yield await task
+                except Exception as e:
+                    logger.warning("Error fetching location for query '%s': %s", query, e)
+        finally:
+            for task in tasks:
+                task.cancel()
 
     @staticmethod
-    def _get_location_details(location_id: str) -> dict:
-        url = f"https://api.content.tripadvisor.com/api/v1/location/{location_id}/details"
+    async def stream_locations_for_queries(queries: List[str], include_photos: bool = True) -> AsyncIterator[Location]:
+        """
+        Run every search query concurrently and yield each unique location as
+        soon as its details are fetched, whichever query it came from, so the
+        first result does not wait for the slowest query.
+        """
+        queries = unique_queries(queries)
+        queue = asyncio.Queue()
+        seen_ids = set()
+
+        async def lookup(query: str):
+            try:
+                async for location in TripAdvisorAction.iter_locations(query, seen_ids, include_photos):
+                    await queue.put(location)
+            except Exception as e:
+                logger.warning("Error fetching locations for query '%s': %s", query, e)
+            finally:
+                await queue.put(None)
+
+        lookups = [asyncio.ensure_future(lookup(query)) for query in queries]
+        try:
+            remaining = len(lookups)
+            while remaining:
+                location = await queue.get()
+                if location is None:
+                    remaining -= 1
+                    continue
+                yield location
+        finally:
+            for task in lookups:
+                task.cancel()
+
+    @staticmethod
+    async def get_location_photos(location_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Resolve the photo URL of many locations concurrently.
+        Locations without a photo, or whose lookup failed, map to None.
+        """
+        location_ids = list(dict.fromkeys(location_ids))
+        photos = await asyncio.gather(*[
+            TripAdvisorAction._get_location_image(location_id) for location_id in location_ids
+        ], return_exceptions=True)
+
+        result = {}
+        for location_id, photo_url in zip(location_ids, photos):
+            if isinstance(photo_url, BaseException):
+                logger.warning("Error fetching photo for location %s: %s", location_id, photo_url)
+                photo_url = None
+            result[location_id] = photo_url
+        return result
+
+    @staticmethod
+    def cached_photo(location_id: str) -> Optional[str]:
+        """
+        The location's photo URL if it is already cached, without calling TripAdvisor
+        """
+        return photo_cache.get(location_id) or None
+
+    @staticmethod
+    async def _get_location(location_id: str, include_photo: bool = True) -> Location:
+        """
+        Fetch details and photo for a single location in parallel and parse them.
+        Without include_photo only a cached photo URL is used.
+        """
+        if not include_photo:
+            response = await TripAdvisorAction._get_location_details(location_id)
+            return TripAdvisorAction._parse_location_response(response, TripAdvisorAction.cached_photo(location_id))
+
+        response, photo_url = await asyncio.gather(
+            TripAdvisorAction._get_location_details(location_id),
+            TripAdvisorAction._get_location_image(location_id),
+            return_exceptions=True
+        )
+        if isinstance(response, BaseException):
+            raise response
+        if isinstance(photo_url, BaseException):
+            logger.warning("Error fetching photo for location %s: %s", location_id, photo_url)
+            photo_url = None
+        return TripAdvisorAction._parse_location_response(response, photo_url)
+
+    @staticmethod
+    async def _get(path: str, params: dict) -> dict:
+        """
+        GET a TripAdvisor endpoint through the shared client, bounded by the
+        concurrency limit and the TripAdvisor rate-limit scheduler
+        """
+        async with _get_semaphore():
+            response = await scheduled_get("tripadvisor", f"{TRIPADVISOR_API_URL}{path}", params=params)
+        return response.json()
+
+    @staticmethod
+    @observe_upstream
+    async def _get_location_details(location_id: str) -> dict:
+        cached = details_cache.get(location_id)
+        if cached is not None:
+            return cached
         params = {
             "key": tripadvisor_key,
             "language": "en",
             "currency": "USD",
         }
-        response = requests.get(url, params=params)
-        return response.json()
+        response = await TripAdvisorAction._get(f"/location/{location_id}/details", params)
+        # Only cache real payloads, never error bodies
+        if "location_id" in response and "error" not in response:
+            details_cache.set(location_id, response)
+        return response
+
     @staticmethod
-    def _get_location_by_query(query: str, limit: int = 5) -> dict:
-        url = f"https://api.content.tripadvisor.com/api/v1/location/search"
+    @observe_upstream
+    async def _get_location_by_query(query: str, limit: int = 5) -> List[str]:
+        """
+        Return the IDs of the top search results for query, in rank order
+        """
+        # Keyed on the normalized query, but searched as written: normalizing
+        # changes results ("The Hague" -> "hague", "St. Peter's" -> "st peter s")
+        cache_key = f"{limit}:{normalize_query(query)}"
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached
         params = {
             "key": tripadvisor_key,
-            "searchQuery": query,
+            "searchQuery": query.strip(),
         }
-        response = requests.get(url, params=params)
-        return response.json()['data'][:limit]
+        response = await TripAdvisorAction._get("/location/search", params)
+        location_ids = [str(location['location_id']) for location in response['data'][:limit]]
+        search_cache.set(cache_key, location_ids)
+        return location_ids
+
     @staticmethod
-    def _get_location_image(location_id: str) -> str:
-        url = f"https://api.content.tripadvisor.com/api/v1/location/{location_id}/photos"
+    @observe_upstream
+    async def _get_location_image(location_id: str) -> Optional[str]:
+        """
+        URL of the location's first photo, or None if it has no photos
+        """
+        cached = photo_cache.get(location_id)
+        if cached is not None:
+            return cached or None
         params = {
             "key": tripadvisor_key,
             "language": "en",
             "currency": "USD",
         }
-        response = requests.get(url, params=params)
-        return response.json()["data"][0]["images"]["original"]["url"]
+        response = await TripAdvisorAction._get(f"/location/{location_id}/photos", params)
+        if "data" not in response:
+            # Error bodies are never cached
+            raise ValueError(f"unexpected photos response: {response.get('error', response)}")
+        photo_url = ""
+        if response["data"]:
+            images = response["data"][0].get("images", {})
+            photo_url = (images.get("original") or images.get("large") or {}).get("url", "")
+        photo_cache.set(location_id, photo_url)
+        return photo_url or None
     
     
 # write a few tests for the TripAdvisorAction class
 if __name__ == "__main__":
     # Test the prepare_itenary method
-    images = TripAdvisorAction._get_location_image("8093951")
+    images = asyncio.run(TripAdvisorAction._get_location_image("8093951"))
     print(images)
@@ -0,0 +1,81 @@
+import asyncio
+from typing import AsyncIterator, Tuple
+from schema.Plan import Plan
+from actions.openAiActions import OpenAiActions
+from actions.tripAdvisorActions import TripAdvisorAction
+from utils.cache import normalize_query
+from utils.log import get_logger
+
+logger = get_logger('tripPlanner')
+
+# Sentinel put on the queue once the itinerary and every lookup are finished
+_DONE = object()
+
+class TripPlannerAction:
+    @staticmethod
+    async def plan_trip(plan: Plan, use_cache: bool = True) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Generate an itinerary and its TripAdvisor locations in one pipeline.
+        The itinerary is streamed with query keywords first, and a location
+        lookup starts as soon as each keyword is parsed, so lookups overlap
+        with the rest of the generation. Locations are sent without waiting
+        for their photo, which follows as a separate event. Yields (event, data) pairs:
+          ("itinerary", markdown chunk), ("keywords", [keywords]), ("location", Location),
+          ("photo", {"location_id", "photo_url"})
+        """
+        queue = asyncio.Queue()
+        seen_queries = set()
+        seen_ids = set()
+        lookups = []
+
+        async def send_photo(location_id: str):
+            try:
+                photo_url = await TripAdvisorAction._get_location_image(location_id)
+            except Exception as e:
+                logger.warning("Error fetching photo for location %s: %s", location_id, e)
+                return
+            if photo_url:
+                await queue.put(("photo", {"location_id": location_id, "photo_url": photo_url}))
+
+        async def lookup(keyword: str):
+            photos = []
+            try:
+                async for location in TripAdvisorAction.iter_locations(keyword, seen_ids, include_photos=False):
+                    await queue.put(("location", location))
+                    if location.photo_url is None:
+                        photos.append(asyncio.ensure_future(send_photo(location.location_id)))
+                await asyncio.gather(*photos)
+            except Exception as e:
+                logger.warning("Error fetching locations for query '%s': %s", keyword, e)
+            finally:
+                for task in photos:
+                    task.cancel()
+
+        async def generate():
+            try:
+                async for event, data in OpenAiActions.streamItinerary(plan, use_cache=use_cache, keywords_first=True):
+                    if event == "keyword":
+                        query = normalize_query(data)
+                        if query and query not in seen_queries:
+                            seen_queries.add(query)
+                            lookups.append(asyncio.ensure_future(lookup(data.strip())))
+                        continue
+                    await queue.put((event, data))
+                await asyncio.gather(*lookups)
+                await queue.put((_DONE, None))
+            except Exception as e:
+                await queue.put(("error", e))
+
+        producer = asyncio.ensure_future(generate())
+        try:
+            while True:
+                event, data = await queue.get()
+                if event is _DONE:
+                    return
+                if event == "error":
+                    raise data
+                yield event, data
+        finally:
+            producer.cancel()
+            for task in lookups:
+                task.cancel()
@@ -1,24 +1,107 @@
-import requests
+import asyncio
 import dotenv 
 import os
 import json
-from typing import List
+import time
+import shutil
+from typing import Dict, List, Optional
 from schema.Image import Image
+from utils.http import get_async_client, scheduled_get
+from utils.cache import PersistentCache, TTLCache, normalize_query
+from utils.concurrency import SingleFlight
+from utils.metrics import observe_upstream, upstream_call
+from actions.savedImageIndex import saved_image_index, SAVED_IMAGES_DIR
+from actions.imageVariants import generate_missing_variants
+from utils.log import get_logger
+
+logger = get_logger('unsplash')
 
 dotenv.load_dotenv(os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
 ACCESS_KEY = os.getenv('UNSPLASH_ACCESS_KEY')
+UNSPLASH_API_URL = os.getenv('UNSPLASH_API_URL', 'https://api.unsplash.com')
+# Parallel photo downloads when filling the saved image pool
+UNSPLASH_DOWNLOAD_WORKERS = int(os.getenv('UNSPLASH_DOWNLOAD_WORKERS', '8'))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Downloaded chunks are buffered and written to disk on a worker thread in batches of this size
+DOWNLOAD_WRITE_BATCH = 1024 * 1024
+
+# Search results per normalized query; stale pages are served while they refresh
+UNSPLASH_SEARCH_TTL = float(os.getenv('UNSPLASH_SEARCH_TTL', '3600'))
+UNSPLASH_SEARCH_STALE_TTL = float(os.getenv('UNSPLASH_SEARCH_STALE_TTL', str(24 * 3600)))
+UNSPLASH_SEARCH_CACHE_SIZE = int(os.getenv('UNSPLASH_SEARCH_CACHE_SIZE', '1024'))
+search_cache = TTLCache(UNSPLASH_SEARCH_CACHE_SIZE, UNSPLASH_SEARCH_TTL, stale_seconds=UNSPLASH_SEARCH_STALE_TTL, name='unsplash_search')
+search_flight = SingleFlight()
+_background_refreshes = set()
+
+# Photo tags rarely change; shared by every worker and reused across pins
+UNSPLASH_TAG_TTL = float(os.getenv('UNSPLASH_TAG_TTL', str(30 * 24 * 3600)))
+tag_cache = PersistentCache('unsplash_tags', UNSPLASH_TAG_TTL, int(os.getenv('UNSPLASH_TAG_CACHE_SIZE', '50000')))
+tag_flight = SingleFlight()
+# Upper bound on concurrent photos/{id} requests per worker
+tag_semaphore = asyncio.Semaphore(int(os.getenv('UNSPLASH_TAG_CONCURRENCY', '8')))
 
 class UnsplashAction:
     @staticmethod
-    def get_photo_tags(photo_id):
+    async def get_photo_tags(photo_id):
         """Fetch photo tags using the photo ID"""
-        tags_url = f'https://api.unsplash.com/photos/{photo_id}'
+        tags = await UnsplashAction.get_tags_for_images([photo_id])
+        return tags[photo_id]
+
+    @staticmethod
+    async def get_tags_for_images(photo_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        Return {photo_id: tags} for many photos. Tags already known from the
+        saved image pool or the tag cache are reused; the rest are fetched
+        concurrently (each photo at most once, even across requests) and
+        written back to the cache and to pooled images' metadata.json.
+        """
+        tags_by_id = {}
+        missing = []
+        for photo_id in dict.fromkeys(photo_ids):
+            pooled = saved_image_index.get(photo_id)
+            cached = tag_cache.get(photo_id)
+            if pooled is not None and pooled.tags:
+                tags_by_id[photo_id] = pooled.tags
+            elif cached is not None:
+                tags_by_id[photo_id] = cached
+            else:
+                missing.append(photo_id)
+        
+        fetched = await asyncio.gather(*[
+            tag_flight.do(photo_id, lambda photo_id=photo_id: UnsplashAction._fetch_photo_tags(photo_id))
+            for photo_id in missing
+        ])
+        
+        pooled_updates = []
+        for photo_id, tags in zip(missing, fetched):
+            if tags is None:
+                tags_by_id[photo_id] = []
+                continue
+            tags_by_id[photo_id] = tags
+            tag_cache.set(photo_id, tags)
+            pooled = saved_image_index.get(photo_id)
+            if pooled is not None and tags:
+                pooled_updates.append(pooled.copy(update={'tags': tags}))
+        
+        if pooled_updates:
+            await asyncio.to_thread(UnsplashAction._write_pooled_metadata, pooled_updates)
+            await asyncio.to_thread(saved_image_index.add, pooled_updates)
+        return tags_by_id
+
+    @staticmethod
+    @observe_upstream
+    async def _fetch_photo_tags(photo_id: str) -> Optional[List[str]]:
+        """
+        Fetch a photo's tag titles from Unsplash; None if the request failed
+        """
+        tags_url = f'{UNSPLASH_API_URL}/photos/{photo_id}'
         params = {
             'client_id': ACCESS_KEY
         }
         
         try:
-            response = requests.get(tags_url, params=params)
+            async with tag_semaphore:
+                response = await scheduled_get('unsplash', tags_url, params=params)
             if response.status_code == 200:
                 photo_data = response.json()
                 tags = photo_data.get('tags', [])
@@ -26,14 +109,35 @@ class UnsplashAction:
                 tag_titles = [tag.get('title', '') for tag in tags if tag.get('title')]
                 return tag_titles
             else:
-                print(f"❌ Failed to fetch tags for photo {photo_id}: {response.status_code}")
-                return []
+                logger.warning("Failed to fetch tags for photo %s: %s", photo_id, response.status_code)
+                return None
         except Exception as e:
-            print(f"❌ Error fetching tags for photo {photo_id}: {e}")
-            return []
+            logger.warning("Error fetching tags for photo %s: %s", photo_id, e)
+            return None
 
     @staticmethod
-    def get_random_images() -> List[Image]:
+    def _write_pooled_metadata(images: List[Image]):
+        """
+        Atomically rewrite metadata.json for pooled images (e.g. with fetched tags),
+        keeping the savedAt time the pool's rotation is based on
+        """
+        for image in images:
+            metadata_path = os.path.join(SAVED_IMAGES_DIR, f"image_{image.id}", 'metadata.json')
+            try:
+                with open(metadata_path, 'r') as f:
+                    saved_at = json.load(f).get('savedAt')
+                if saved_at is None:
+                    # Saved before savedAt existed: the original file is never rewritten
+                    saved_at = os.stat(os.path.join(os.path.dirname(metadata_path), 'image.jpg')).st_mtime
+            except (OSError, ValueError):
+                continue
+            with open(f"{metadata_path}.tmp", 'w') as f:
+                json.dump({**image.dict(), 'savedAt': saved_at}, f, indent=2)
+            os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    @staticmethod
+    @observe_upstream
+    async def get_random_images() -> List[Image]:
         """
         Get random images from Unsplash for webpage initialization
         
@@ -44,14 +148,14 @@ class UnsplashAction:
         
         try:
             # Get random images
-            url = 'https://api.unsplash.com/photos/random'
+            url = f'{UNSPLASH_API_URL}/photos/random'
             params = {
                 'count': 30,  # Fixed count for random images
                 'client_id': ACCESS_KEY,
                 'orientation': 'landscape'  # Better for web display
             }
             
-            response = requests.get(url, params=params)
+            response = await scheduled_get('unsplash', url, params=params)
             
             if response.status_code == 200:
                 
@@ -81,26 +185,56 @@ class UnsplashAction:
                     
                     images.append(image_obj)
                     
-                print(f"✅ Successfully fetched {len(images)} random images")
+                logger.debug("Fetched %d random images", len(images))
                 
             else:
-                print(f"❌ Failed to fetch random images: {response.status_code}")
-                print(f"❌ Response: {response.text}")
+                logger.error("Failed to fetch random images: %s", response.status_code, extra={'response': response.text[:1000]})
 
 
         except Exception as e:
-            print(f"❌ Error fetching random images: {e}")
-            print(f"❌ Response: {response.text}")
+            logger.error("Error fetching random images: %s", e)
+        
+        return images
+
+    @staticmethod
+    async def get_images(query: str) -> List[Image]:
+        """
+        Search Unsplash for query. Results are cached per normalized query,
+        concurrent identical searches share one upstream call, and an expired
+        page is returned immediately while it is refreshed in the background.
+        """
+        key = normalize_query(query)
+        entry = search_cache.get_entry(key)
+        if entry is not None:
+            images, fresh = entry
+            if not fresh and not search_flight.in_flight(key):
+                task = asyncio.ensure_future(search_flight.do(key, lambda: UnsplashAction._refresh_search(key, query)))
+                _background_refreshes.add(task)
+                task.add_done_callback(_background_refreshes.discard)
+            return images
         
+        images = await search_flight.do(key, lambda: UnsplashAction._refresh_search(key, query))
+        return images if images is not None else []
+
+    @staticmethod
+    async def _refresh_search(key: str, query: str) -> Optional[List[Image]]:
+        """
+        Search for query as written, cache the page under its normalized key;
+        returns None (uncached) on failure
+        """
+        images = await UnsplashAction._search_images(query.strip())
+        if images is not None:
+            search_cache.set(key, images)
         return images
 
     @staticmethod
-    def get_images(query: str) -> List[Image]:
+    @observe_upstream
+    async def _search_images(query: str) -> Optional[List[Image]]:
         images = []
         
         try:
             # Search for images with specific query
-            url = 'https://api.unsplash.com/search/photos'
+            url = f'{UNSPLASH_API_URL}/search/photos'
             params = {
                 'query': query,
                 'per_page': 30,
@@ -108,7 +242,7 @@ class UnsplashAction:
                 'orientation': 'landscape'  # Better for web display
             }
             
-            response = requests.get(url, params=params)
+            response = await scheduled_get('unsplash', url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -135,158 +269,221 @@ class UnsplashAction:
                     
                     images.append(image_obj)
                     
-                print(f"✅ Successfully fetched {len(images)} images for query: '{query}'")
+                logger.debug("Fetched %d images for query '%s'", len(images), query)
                 
             else:
-                print(f"❌ Failed to fetch images for query '{query}': {response.status_code}")
-                print(f"❌ Response: {response.text}")
+                logger.error("Failed to fetch images for query '%s': %s", query, response.status_code, extra={'response': response.text[:1000]})
+                return None
         except Exception as e:
-            print(f"❌ Error fetching images for query '{query}': {e}")
+            logger.error("Error fetching images for query '%s': %s", query, e)
+            return None
         
         return images
 
     @staticmethod
-    def save_images():
+    @observe_upstream
+    async def save_images(target_count: int = 150):
         """
         Fetch random images from Unsplash and save them locally with metadata
-        Maintains a goal of 150 images in the saved_images folder
+        Maintains a goal of target_count (150) images in the saved_images folder.
+        Downloads run concurrently and are crash-safe: an image only counts once
+        its metadata.json exists, and unfinished folders are cleaned up or
+        recovered on the next run.
         """
         try:
             # Create images directory if it doesn't exist
-            images_dir = os.path.join(os.path.dirname(__file__), '..', 'saved_images')
+            images_dir = SAVED_IMAGES_DIR
             os.makedirs(images_dir, exist_ok=True)
+            await asyncio.to_thread(UnsplashAction._recover_partial_downloads, images_dir)
             
             # Check current number of saved images
-            existing_folders = [f for f in os.listdir(images_dir) if f.startswith('image_')]
-            current_count = len(existing_folders)
-            target_count = 150
+            existing_ids = set(saved_image_index.ids())
+            current_count = len(existing_ids)
             
             if current_count >= target_count:
-                print(f"✅ Already have {current_count} images, no need to fetch more")
+                logger.info("Already have %d images, no need to fetch more", current_count)
                 return current_count
             
             # Calculate how many images to fetch
             images_needed = target_count - current_count
-            print(f"📊 Current: {current_count}, Target: {target_count}, Need: {images_needed}")
+            logger.info("Image pool: current %d, target %d, need %d", current_count, target_count, images_needed)
             
             # Fetch images in batches of 30 (API limit)
             saved_count = current_count
             batch_size = 30
+            semaphore = asyncio.Semaphore(UNSPLASH_DOWNLOAD_WORKERS)
+            empty_batches = 0
             
-            while saved_count < target_count:
+            while saved_count < target_count and empty_batches < 3:
                 batch_needed = min(batch_size, target_count - saved_count)
                 
-                url = 'https://api.unsplash.com/photos/random'
+                url = f'{UNSPLASH_API_URL}/photos/random'
                 params = {
                     'count': batch_needed,
                     'client_id': ACCESS_KEY,
                     'orientation': 'landscape'
                 }
                 
-                response = requests.get(url, params=params)
+                response = await scheduled_get('unsplash', url, params=params)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    photos = data if isinstance(data, list) else [data]
-                    
-                    for photo in photos:
-                        try:
-                            photo_id = photo.get('id', '')
-                            
-                            # Skip if image already exists
-                            if f"image_{photo_id}" in existing_folders:
-                                continue
-                                
-                            image_url = photo.get('urls', {}).get('regular', '')
-                            description = photo.get('description', '')
-                            alt_text = photo.get('alt_description') or description or ""
-                            
-                            # Create folder for this image
-                            image_folder = os.path.join(images_dir, f"image_{photo_id}")
-                            os.makedirs(image_folder, exist_ok=True)
-                            
-                            # Download and save the image
-                            img_response = requests.get(image_url)
-                            if img_response.status_code == 200:
-                                img_path = os.path.join(image_folder, 'image.jpg')
-                                with open(img_path, 'wb') as f:
-                                    f.write(img_response.content)
-                                
-                                # Create Image object metadata
-                                image_obj = Image(
-                                    id=photo_id,
-                                    url=image_url,
-                                    description=description,
-                                    altText=alt_text,
-                                    tags=[]  # Tags will be fetched when needed
-                                )
-                                
-                                # Save metadata as JSON
-                                metadata_path = os.path.join(image_folder, 'metadata.json')
-                                with open(metadata_path, 'w') as f:
-                                    json.dump(image_obj.dict(), f, indent=2)
-                                
-                                saved_count += 1
-                                print(f"✅ Saved image {photo_id} ({saved_count}/{target_count})")
-                                
-                        except Exception as e:
-                            print(f"❌ Error saving image {photo.get('id', 'unknown')}: {e}")
-                            continue
-                    
-                    # Update existing folders list for next iteration
-                    existing_folders = [f for f in os.listdir(images_dir) if f.startswith('image_')]
-                    
-                else:
-                    print(f"❌ Failed to fetch images: {response.status_code}")
+                if response.status_code != 200:
+                    logger.error("Failed to fetch images: %s", response.status_code)
                     break
+                
+                data = response.json()
+                photos = data if isinstance(data, list) else [data]
+                # Skip images we already have (or got twice in this batch)
+                new_photos = {}
+                for photo in photos:
+                    photo_id = photo.get('id', '')
+                    if photo_id and photo_id not in existing_ids:
+                        new_photos[photo_id] = photo
+                
+                results = await asyncio.gather(*[
+                    UnsplashAction._download_photo(photo, images_dir, semaphore)
+                    for photo in new_photos.values()
+                ])
+                saved_batch = [image for image in results if image is not None]
+                empty_batches = 0 if saved_batch else empty_batches + 1
+                
+                existing_ids.update(image.id for image in saved_batch)
+                saved_count += len(saved_batch)
+                logger.info("Saved %d images (%d/%d)", len(saved_batch), saved_count, target_count)
+                
+                # Publish the batch to the index (and manifest) for every worker
+                await asyncio.to_thread(saved_image_index.add, saved_batch)
+                await generate_missing_variants([image.id for image in saved_batch])
             
-            print(f"✅ Successfully saved {saved_count} images to {images_dir}")
+            logger.info("Saved %d images to %s", saved_count, images_dir)
             return saved_count
                 
         except Exception as e:
-            print(f"❌ Error in save_images: {e}")
+            logger.exception("Error in save_images: %s", e)
             return 0
 
+    @staticmethod
+    @observe_upstream
+    async def _download_photo(photo: dict, images_dir: str, semaphore: asyncio.Semaphore) -> Optional[Image]:
+        """
+        Stream one photo to disk through a temp file, verify it, then write its
+        metadata. Returns the Image, or None if the download failed.
+        """
+        photo_id = photo.get('id', '')
+        image_url = photo.get('urls', {}).get('regular', '')
+        description = photo.get('description', '')
+        alt_text = photo.get('alt_description') or description or ""
+        image_folder = os.path.join(images_dir, f"image_{photo_id}")
+        part_path = os.path.join(image_folder, 'image.jpg.part')
+        
+        async with semaphore:
+            try:
+                # All file work runs on worker threads: this also runs in serving workers
+                await asyncio.to_thread(os.makedirs, image_folder, exist_ok=True)
+                async with upstream_call('unsplash') as call, get_async_client().stream('GET', image_url) as img_response:
+                    call.status = img_response.status_code
+                    if img_response.status_code != 200:
+                        logger.warning("Failed to download image %s: %s", photo_id, img_response.status_code)
+                        await asyncio.to_thread(shutil.rmtree, image_folder, ignore_errors=True)
+                        return None
+                    expected_size = int(img_response.headers.get('content-length', 0))
+                    size = 0
+                    f = await asyncio.to_thread(open, part_path, 'wb')
+                    try:
+                        batch = bytearray()
+                        async for chunk in img_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            batch += chunk
+                            size += len(chunk)
+                            if len(batch) >= DOWNLOAD_WRITE_BATCH:
+                                await asyncio.to_thread(f.write, bytes(batch))
+                                batch.clear()
+                        if batch:
+                            await asyncio.to_thread(f.write, bytes(batch))
+                    finally:
+                        await asyncio.to_thread(f.close)
+                
+                if expected_size and size != expected_size:
+                    raise ValueError(f"truncated download ({size}/{expected_size} bytes)")
+                
+                # Create Image object metadata
+                image_obj = Image(
+                    id=photo_id,
+                    url=image_url,
+                    description=description,
+                    altText=alt_text,
+                    tags=[]  # Tags will be fetched when needed
+                )
+                await asyncio.to_thread(UnsplashAction._finish_download, image_folder, part_path, image_obj)
+                return image_obj
+                
+            except Exception as e:
+                logger.warning("Error saving image %s: %s", photo_id, e)
+                await asyncio.to_thread(shutil.rmtree, image_folder, ignore_errors=True)
+                return None
+
+    @staticmethod
+    def _finish_download(image_folder: str, part_path: str, image: Image):
+        """
+        Verify a downloaded photo, move it into place and write its metadata
+        """
+        UnsplashAction._verify_image(part_path)
+        os.replace(part_path, os.path.join(image_folder, 'image.jpg'))
+        # metadata.json is written last and atomically: it marks the image as complete
+        metadata_path = os.path.join(image_folder, 'metadata.json')
+        with open(f"{metadata_path}.tmp", 'w') as f:
+            json.dump({**image.dict(), 'savedAt': time.time()}, f, indent=2)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    @staticmethod
+    def _verify_image(path: str):
+        """
+        Raise if the file is not a complete JPEG
+        """
+        with open(path, 'rb') as f:
+            header = f.read(2)
+            f.seek(-2, os.SEEK_END)
+            trailer = f.read(2)
+        if header != b'\xff\xd8' or trailer != b'\xff\xd9':
+            raise ValueError("not a complete JPEG file")
+
+    @staticmethod
+    def _recover_partial_downloads(images_dir: str):
+        """
+        Resume after an interrupted run: delete folders that never got their
+        metadata.json, and index complete folders missing from the manifest
+        """
+        indexed_ids = set(saved_image_index.ids())
+        recovered = []
+        for folder in os.listdir(images_dir):
+            if not folder.startswith('image_'):
+                continue
+            image_folder = os.path.join(images_dir, folder)
+            metadata_path = os.path.join(image_folder, 'metadata.json')
+            if not os.path.exists(metadata_path):
+                logger.info("Removing incomplete download %s", folder)
+                shutil.rmtree(image_folder, ignore_errors=True)
+            elif folder[len('image_'):] not in indexed_ids:
+                try:
+                    with open(metadata_path, 'r') as f:
+                        recovered.append(Image(**json.load(f)))
+                except Exception as e:
+                    logger.error("Error recovering image from %s: %s", folder, e)
+        saved_image_index.add(recovered)
+
     @staticmethod
     def load_saved_images(count: int = 40) -> List[Image]:
         """
-        Load random images from saved images folder
+        Load random images from the in-memory saved image index
         """
         try:
-            images_dir = os.path.join(os.path.dirname(__file__), '..', 'saved_images')
-            
-            if not os.path.exists(images_dir):
-                print("❌ Saved images directory doesn't exist")
+            images = saved_image_index.sample(count)
+            if not images:
+                logger.warning("No saved images found")
                 return []
-            
-            # Get all image folders
-            image_folders = [f for f in os.listdir(images_dir) if f.startswith('image_')]
-            
-            if not image_folders:
-                print("❌ No saved images found")
-                return []
-            
-            # Randomly select folders
-            import random
-            selected_folders = random.sample(image_folders, min(count, len(image_folders)))
-            
-            images = []
-            for folder in selected_folders:
-                try:
-                    metadata_path = os.path.join(images_dir, folder, 'metadata.json')
-                    if os.path.exists(metadata_path):
-                        with open(metadata_path, 'r') as f:
-                            metadata = json.load(f)
-                            images.append(Image(**metadata))
-                except Exception as e:
-                    print(f"❌ Error loading image from {folder}: {e}")
-                    continue
-            
-            print(f"✅ Loaded {len(images)} saved images")
+            logger.debug("Loaded %d saved images", len(images))
             return images
             
         except Exception as e:
-            print(f"❌ Error loading saved images: {e}")
+            logger.error("Error loading saved images: %s", e)
             return []
 
     def printImages(images: List[Image], title: str = "Images"):
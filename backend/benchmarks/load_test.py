@@ -0,0 +1,247 @@
+"""
+Load-test and latency benchmark for every Zola endpoint.
+
+Starts the upstream stubs (benchmarks/stub_servers.py), launches the backend
+with uvicorn pointed at them, then drives each endpoint at rising
+concurrency and reports p50/p95/p99 latency, throughput, errors and the
+number of upstream calls per request.
+
+Example:
+    python benchmarks/load_test.py --concurrency 1,8,32 --requests 64 --latency-ms 150
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+sys.path.append(os.path.dirname(__file__))
+from stub_servers import StubConfig, free_port, start_stubs, stub_env
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+CITIES = ["Paris", "Kyoto", "Lisbon", "New York", "Cape Town", "Mexico City", "Seoul", "Rome"]
+MOODS = ["romantic", "adventurous", "relaxing", "foodie"]
+
+def plan(no_cache: bool) -> dict:
+    body = {
+        "dateFrom": "2025-05-10T00:00:00.000Z",
+        "dateTo": "2025-05-13T00:00:00.000Z",
+        "location": random.choice(CITIES),
+        "numPeople": random.randint(1, 4),
+        "budget": "medium",
+        "mood": random.choice(MOODS),
+        "images": [],
+    }
+    if no_cache:
+        body["noCache"] = True
+    return body
+
+def keyword(unique: bool) -> str:
+    return f"{random.choice(CITIES)} {random.getrandbits(24) if unique else random.randint(1, 10)}"
+
+def location_ids(unique: bool) -> List[str]:
+    # The TripAdvisor stub returns IDs 1000-1400 from its searches
+    return [str(random.getrandbits(32) if unique else random.randint(1000, 1400)) for _ in range(20)]
+
+# Pooled image files (/saved-images/{id}/{file}), collected once the backend's pool is filled
+SAVED_IMAGE_PATHS: List[str] = []
+
+def saved_image_path() -> str:
+    return random.choice(SAVED_IMAGE_PATHS)
+
+def collect_saved_image_paths(base_url: str):
+    response = httpx.get(f"{base_url}/get-random-images", timeout=30)
+    for image in response.json().get("data", {}).get("images", []):
+        for url in (image.get("url"), image.get("thumbUrl")):
+            if url and "/saved-images/" in url:
+                SAVED_IMAGE_PATHS.append(httpx.URL(url).path)
+
+# name -> (method, path or path factory, body factory); body factories receive the --no-cache flag
+ENDPOINTS: Dict[str, tuple] = {
+    "root": ("GET", "/", None),
+    "get-random-images": ("GET", "/get-random-images", None),
+    "saved-image": ("GET", saved_image_path, None),
+    "get-images": ("GET", "/get-images", lambda cold: {"params": {"query": keyword(cold)}}),
+    "pin-image": ("POST", "/pin-image", lambda cold: {"json": {"imageId": f"q{random.getrandbits(16):x}"}}),
+    "pin-images": ("POST", "/pin-images", lambda cold: {"json": {"imageIds": [f"q{random.getrandbits(16):x}" for _ in range(20)]}}),
+    "get-locations": ("POST", "/get-locations", lambda cold: {"json": {"queries": [keyword(cold) for _ in range(12)]}}),
+    "get-locations-stream": ("POST", "/get-locations/stream", lambda cold: {"json": {"queries": [keyword(cold) for _ in range(12)]}}),
+    "location-photos": ("POST", "/location-photos", lambda cold: {"json": {"locationIds": location_ids(cold)}}),
+    "create-itinerary": ("POST", "/create-itinerary", lambda cold: {"json": plan(cold)}),
+    "create-itinerary-stream": ("POST", "/create-itinerary/stream", lambda cold: {"json": plan(cold)}),
+    "plan-trip": ("POST", "/plan-trip", lambda cold: {"json": plan(cold)}),
+}
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+async def one_request(client: httpx.AsyncClient, name: str, cold: bool) -> tuple:
+    """
+    Returns (latency seconds, time to first byte, ok)
+    """
+    method, path, factory = ENDPOINTS[name]
+    if callable(path):
+        path = path()
+    kwargs = factory(cold) if factory else {}
+    start = time.perf_counter()
+    first_byte = None
+    body = b""
+    async with client.stream(method, path, **kwargs) as response:
+        async for chunk in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            body += chunk
+    latency = time.perf_counter() - start
+    ok = response.status_code < 400
+    if ok and response.headers.get("content-type", "").startswith("application/json"):
+        ok = json.loads(body).get("status", "success") == "success"
+    elif ok and response.headers.get("content-type", "").startswith("text/event-stream"):
+        ok = b"event: error" not in body
+    elif ok and response.headers.get("content-type", "").startswith("application/x-ndjson"):
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        ok = bool(records) and records[-1].get("type") == "done" and all(r.get("type") != "error" for r in records)
+    return latency, first_byte or latency, ok
+
+async def run_level(base_url: str, name: str, concurrency: int, total: int, cold: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_bytes, errors = [], [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            async with semaphore:
+                try:
+                    latency, first_byte, ok = await one_request(client, name, cold)
+                    latencies.append(latency)
+                    first_bytes.append(first_byte)
+                    errors += 0 if ok else 1
+                except Exception:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(total)])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "endpoint": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "ttfb_p50_ms": percentile(first_bytes, 50) * 1000,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+    }
+
+def start_backend(env: Dict[str, str], port: int, workers: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env, "ZOLA_WORKERS": str(workers)},
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("backend did not start within 30s")
+
+def upstream_calls(stubs) -> Counter:
+    calls = Counter()
+    for provider, stub in stubs.items():
+        for route, count in stub.calls().items():
+            calls[f"{provider}{route}"] += count
+    return calls
+
+def print_table(results: List[dict]):
+    header = f"{'endpoint':<24}{'conc':>5}{'reqs':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttfb ms':>9}{'req/s':>8}{'up/req':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['endpoint']:<24}{r['concurrency']:>5}{r['requests']:>6}{r['errors']:>5}"
+              f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}{r['ttfb_p50_ms']:>9.0f}"
+              f"{r['throughput_rps']:>8.1f}{r['upstream_per_request']:>8.1f}")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark Zola endpoints against local upstream stubs")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated endpoint names")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="requests per endpoint and level")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--latency-ms", type=float, default=100, help="mean upstream latency")
+    parser.add_argument("--distribution", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--token-delay-ms", type=float, default=15, help="OpenAI stub delay per streamed chunk")
+    parser.add_argument("--pool-size", type=int, default=60, help="saved image pool target")
+    parser.add_argument("--no-cache", action="store_true", help="unique queries and noCache itineraries (cold caches)")
+    parser.add_argument("--json", dest="json_path", help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(args.latency_ms, args.distribution, args.error_rate, args.error_status, args.token_delay_ms)
+    stubs = start_stubs(config)
+    workdir = tempfile.mkdtemp(prefix="zola-bench-")
+    env = {
+        **stub_env(stubs),
+        "ZOLA_CACHE_PATH": os.path.join(workdir, "cache.sqlite3"),
+        "ZOLA_SAVED_IMAGES_DIR": os.path.join(workdir, "saved_images"),
+        "ZOLA_POOL_TARGET": str(args.pool_size),
+        # Stubs have no quota; don't let the scheduler become the bottleneck
+        "UNSPLASH_RATE_PER_SECOND": "10000", "UNSPLASH_RATE_BURST": "10000",
+        "TRIPADVISOR_RATE_PER_SECOND": "10000", "TRIPADVISOR_RATE_BURST": "10000",
+        "OPENAI_RATE_PER_SECOND": "10000", "OPENAI_RATE_BURST": "10000",
+    }
+    port = free_port()
+    backend = start_backend(env, port, args.workers)
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        # Give the background replenisher a moment to fill the image pool
+        time.sleep(2)
+        collect_saved_image_paths(base_url)
+        if not SAVED_IMAGE_PATHS and "saved-image" in args.endpoints.split(","):
+            print("Image pool is empty; skipping saved-image", file=sys.stderr)
+            args.endpoints = ",".join(name for name in args.endpoints.split(",") if name != "saved-image")
+        for name in args.endpoints.split(","):
+            for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                before = upstream_calls(stubs)
+                result = asyncio.run(run_level(base_url, name, concurrency, args.requests, args.no_cache))
+                delta = upstream_calls(stubs) - before
+                result["upstream_calls"] = dict(delta)
+                result["upstream_per_request"] = sum(delta.values()) / args.requests
+                results.append(result)
+        print_table(results)
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        backend.terminate()
+        backend.wait(timeout=10)
+        for stub in stubs.values():
+            stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
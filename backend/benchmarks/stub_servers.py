@@ -0,0 +1,287 @@
+"""
+Local stand-ins for the Unsplash, TripAdvisor and OpenAI endpoints used by
+the action classes, with configurable latency and error distributions.
+Each stub counts the calls it receives (GET /__stats, POST /__reset).
+
+Run standalone:  python benchmarks/stub_servers.py --latency-ms 150
+"""
+
+import io
+import json
+import time
+import random
+import socket
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 100.0         # mean latency per request
+    distribution: str = "lognormal"   # fixed | uniform | exponential | lognormal
+    error_rate: float = 0.0           # fraction of requests that fail
+    error_status: int = 500           # status used for injected failures (e.g. 429)
+    token_delay_ms: float = 15.0      # OpenAI: delay between streamed chunks
+
+    def sample_latency(self) -> float:
+        mean = self.latency_ms / 1000
+        if self.distribution == "fixed":
+            return mean
+        if self.distribution == "uniform":
+            return random.uniform(0, 2 * mean)
+        if self.distribution == "exponential":
+            return random.expovariate(1 / mean) if mean > 0 else 0
+        # lognormal with sigma 0.5, scaled so the mean matches latency_ms
+        return random.lognormvariate(0, 0.5) * mean / 1.133
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+def _tiny_jpeg() -> bytes:
+    try:
+        from PIL import Image as PILImage
+        buffer = io.BytesIO()
+        PILImage.new("RGB", (640, 427), (90, 140, 200)).save(buffer, "JPEG")
+        return buffer.getvalue()
+    except ImportError:
+        return b"\xff\xd8" + bytes(2048) + b"\xff\xd9"
+
+JPEG_BYTES = _tiny_jpeg()
+
+def _seed(*parts) -> int:
+    return int(hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()[:8], 16)
+
+def _stub_app(name: str, config: StubConfig) -> FastAPI:
+    app = FastAPI(title=f"{name} stub")
+    app.state.calls = Counter()
+    app.state.config = config
+
+    @app.middleware("http")
+    async def latency_and_errors(request: Request, call_next):
+        if request.url.path.startswith("/__"):
+            return await call_next(request)
+        app.state.calls[_route_key(request.url.path)] += 1
+        await asyncio.sleep(config.sample_latency())
+        if config.should_fail():
+            headers = {"Retry-After": "1"} if config.error_status == 429 else {}
+            return JSONResponse({"error": "injected failure"}, status_code=config.error_status, headers=headers)
+        return await call_next(request)
+
+    @app.get("/__stats")
+    async def stats():
+        return dict(app.state.calls)
+
+    @app.post("/__reset")
+    async def reset():
+        app.state.calls.clear()
+        return {}
+
+    return app
+
+def _route_key(path: str) -> str:
+    """
+    Collapse IDs out of paths so counters group by endpoint
+    """
+    parts = path.strip("/").split("/")
+    return "/" + "/".join("{id}" if any(c.isdigit() for c in part) and len(part) > 3 else part for part in parts)
+
+def unsplash_app(config: StubConfig, base_url_holder: Dict[str, str]) -> FastAPI:
+    app = _stub_app("unsplash", config)
+
+    def photo(photo_id: str) -> dict:
+        return {
+            "id": photo_id,
+            "description": f"Stub photo {photo_id}",
+            "alt_description": f"a stub landscape {photo_id}",
+            "urls": {"regular": f"{base_url_holder['url']}/cdn/{photo_id}.jpg"},
+        }
+
+    def headers() -> dict:
+        return {"X-Ratelimit-Limit": "5000", "X-Ratelimit-Remaining": "4999"}
+
+    @app.get("/photos/random")
+    async def random_photos(count: int = 1):
+        return JSONResponse([photo(f"rnd{random.getrandbits(40):x}") for _ in range(count)], headers=headers())
+
+    @app.get("/search/photos")
+    async def search(query: str, per_page: int = 10):
+        rng = random.Random(_seed(query))
+        results = [photo(f"q{rng.getrandbits(32):x}") for _ in range(per_page)]
+        return JSONResponse({"total": per_page, "results": results}, headers=headers())
+
+    @app.get("/photos/{photo_id}")
+    async def photo_details(photo_id: str):
+        rng = random.Random(_seed(photo_id))
+        tags = [{"title": rng.choice(["beach", "city", "mountain", "food", "night", "museum"])} for _ in range(3)]
+        return JSONResponse({**photo(photo_id), "tags": tags}, headers=headers())
+
+    @app.get("/cdn/{filename}")
+    async def cdn(filename: str):
+        return Response(JPEG_BYTES, media_type="image/jpeg")
+
+    return app
+
+def tripadvisor_app(config: StubConfig) -> FastAPI:
+    app = _stub_app("tripadvisor", config)
+
+    @app.get("/location/search")
+    async def search(searchQuery: str):
+        rng = random.Random(_seed(searchQuery.lower()))
+        # Overlapping ID space so different keywords share some locations
+        return {"data": [{"location_id": str(rng.randint(1000, 1400)), "name": searchQuery} for _ in range(10)]}
+
+    @app.get("/location/{location_id}/details")
+    async def details(location_id: str):
+        rng = random.Random(_seed(location_id))
+        return {
+            "location_id": location_id,
+            "name": f"Stub Location {location_id}",
+            "description": "A stub attraction. " * rng.randint(5, 40),
+            "address_obj": {"street1": f"{location_id} Main St", "city": "Stubville", "country": "Nowhere"},
+            "rating": str(round(rng.uniform(3, 5), 1)),
+            "web_url": f"https://example.com/{location_id}",
+            "subcategory": [{"name": "attraction", "localized_name": "Attraction"}],
+            "trip_types": [{"name": "couples", "localized_name": "Couples"}],
+        }
+
+    @app.get("/location/{location_id}/photos")
+    async def photos(location_id: str):
+        if _seed(location_id) % 10 == 0:
+            return {"data": []}
+        return {"data": [{"images": {"original": {"url": f"https://example.com/{location_id}.jpg"}}}]}
+
+    return app
+
+def _fake_itinerary(prompt: str) -> str:
+    rng = random.Random(_seed(prompt))
+    days = "".join(
+        f"### Day {day}\n**Morning:**  \n- Stub cafe {rng.randint(1, 99)}\n\n"
+        f"**Afternoon:**  \n- Stub museum {rng.randint(1, 99)}\n\n"
+        f"**Evening:**  \n- Stub restaurant {rng.randint(1, 99)}\n\n"
+        for day in range(1, 4)
+    )
+    keywords = [f"stub attraction {rng.randint(1, 40)}" for _ in range(12)]
+    return json.dumps({"itinerary": days, "query_keywords": keywords})
+
+def openai_app(config: StubConfig) -> FastAPI:
+    app = _stub_app("openai", config)
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        prompt = json.dumps(body.get("messages", []))
+        content = _fake_itinerary(prompt)
+        headers = {"x-ratelimit-remaining-requests": "499", "x-ratelimit-reset-requests": "120ms"}
+        chunks = [content[i:i + 12] for i in range(0, len(content), 12)]
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.token_delay_ms / 1000 * len(chunks))
+            return JSONResponse({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(chunks), "total_tokens": len(chunks)},
+            }, headers=headers)
+
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(config.token_delay_ms / 1000)
+                data = {
+                    "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class StubServer:
+    """
+    Runs one stub app with uvicorn in a daemon thread
+    """
+    def __init__(self, app: FastAPI, port: int):
+        self.app = app
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+    def calls(self) -> Counter:
+        return Counter(self.app.state.calls)
+
+def start_stubs(config: StubConfig) -> Dict[str, StubServer]:
+    """
+    Start the three stubs on free ports; returns {provider: StubServer}
+    """
+    unsplash_port = free_port()
+    holder = {"url": f"http://127.0.0.1:{unsplash_port}"}
+    stubs = {
+        "unsplash": StubServer(unsplash_app(config, holder), unsplash_port),
+        "tripadvisor": StubServer(tripadvisor_app(config), free_port()),
+        "openai": StubServer(openai_app(config), free_port()),
+    }
+    for stub in stubs.values():
+        stub.start()
+    return stubs
+
+def stub_env(stubs: Dict[str, StubServer]) -> Dict[str, str]:
+    """
+    Environment variables that point the backend at the stubs
+    """
+    return {
+        "UNSPLASH_API_URL": stubs["unsplash"].url,
+        "UNSPLASH_ACCESS_KEY": "stub",
+        "TRIPADVISOR_API_URL": stubs["tripadvisor"].url,
+        "TRIPADVISOR_KEY": "stub",
+        "OPENAI_BASE_URL": f"{stubs['openai'].url}/v1",
+        "OPENAI_KEY": "stub",
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local upstream stubs for Zola")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--distribution", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--token-delay-ms", type=float, default=15)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.distribution, args.error_rate, args.error_status, args.token_delay_ms)
+    stubs = start_stubs(config)
+    print("🧪 Stub servers running. Export these before starting the backend:")
+    for key, value in stub_env(stubs).items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for stub in stubs.values():
+            stub.stop()
+
+if __name__ == "__main__":
+    main()
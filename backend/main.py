@@ -1,21 +1,54 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, Any
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import json
+import os
 from actions.unsplashActions import UnsplashAction
 from actions.openAiActions import OpenAiActions
 from actions.tripAdvisorActions import TripAdvisorAction
+from actions.tripPlannerActions import TripPlannerAction
+from actions.savedImageIndex import saved_image_index
+from actions.imageVariants import SERVABLE_FILES, local_image, saved_image_path, shutdown_executor
+from actions.poolReplenisher import run_replenisher
 from schema.Plan import Plan
+from utils.http import close_async_client
+from utils.metrics import MetricsMiddleware, mark_worker_dead, render_metrics
+from utils.tracing import TracingMiddleware
+from utils.responses import CompressionMiddleware, zola_response
+from utils.streaming import ndjson_line, sse_event
+from utils.log import get_logger, log_sampled
+
+logger = get_logger('api')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index the saved image pool once so random pages are served from memory
+    await asyncio.to_thread(saved_image_index.load)
+    # Top up the pool in the background; until then we serve what is already
+    # saved, or fall back to the Unsplash API when the pool is empty
+    replenisher_task = asyncio.create_task(run_replenisher())
+    yield
+    replenisher_task.cancel()
+    shutdown_executor()
+    # Release pooled upstream connections on shutdown
+    await close_async_client()
+    mark_worker_dead()
 
 # Create FastAPI app
 app = FastAPI(
     title="Zola Backend API",
     description="Backend API for Zola travel planning application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Innermost, so only the bytes actually sent are compressed
+app.add_middleware(CompressionMiddleware)
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -24,8 +57,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Root span per request; adds Server-Timing when ZOLA_SERVER_TIMING=1
+app.add_middleware(TracingMiddleware)
+# Outermost, so latency covers every other middleware and the full response body
+app.add_middleware(MetricsMiddleware)
 
 # Response models
+# Documents the envelope; endpoints return zola_response(), which FastAPI
+# passes through without re-validating against this model
 class ZolaResponse(BaseModel):
     status: str
     data: Dict[str, Any]
@@ -34,7 +73,7 @@ class ZolaResponse(BaseModel):
 @app.get("/", response_model=ZolaResponse)
 async def root():
     """Root endpoint - Hello World"""
-    return ZolaResponse(
+    return zola_response(
         status="success",
         data={
             "version": "1.0.0",
@@ -42,40 +81,88 @@ async def root():
         }
     )
     
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this worker, or for all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    status_code, body, content_type = render_metrics()
+    return Response(content=body, status_code=status_code, media_type=content_type)
+
 @app.get("/get-random-images", response_model=ZolaResponse)
-async def get_random_images():
+async def get_random_images(request: Request):
     try:
         # Try to load saved images first, fallback to API if none available
         saved_images = UnsplashAction.load_saved_images(40)
         if saved_images:
-            return ZolaResponse(
+            base_url = str(request.base_url).rstrip('/')
+            return zola_response(
                 status="success",
-                data={"images": saved_images}
+                data={"images": [local_image(image, base_url) for image in saved_images]}
             )
         else:
             # Fallback to API if no saved images
-            random_images = UnsplashAction.get_random_images()
-            return ZolaResponse(
+            random_images = await UnsplashAction.get_random_images()
+            return zola_response(
                 status="success",
                 data={"images": random_images}
             )
     except Exception as e:
-        return ZolaResponse(
+        return zola_response(
             status="error",
             data={"error": str(e)}
         )
 
+IMAGE_MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+}
+
+@app.get("/saved-images/{image_id}/{filename}")
+async def saved_image(image_id: str, filename: str, request: Request):
+    """
+    Serve a pooled image file (original or resized variant).
+    File names never change content, so responses are cached as immutable;
+    AVIF is served in place of WebP when the browser accepts it.
+    """
+    if filename not in SERVABLE_FILES or saved_image_index.get(image_id) is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    path = saved_image_path(image_id, filename)
+    if filename.endswith(".webp") and "image/avif" in request.headers.get("accept", ""):
+        avif_path = path[:-len(".webp")] + ".avif"
+        if os.path.exists(avif_path):
+            path = avif_path
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+        "Vary": "Accept",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path,
+        headers=headers,
+        media_type=IMAGE_MEDIA_TYPES[os.path.splitext(path)[1]],
+        stat_result=stat_result
+    )
+
 @app.get("/get-images", response_model=ZolaResponse)
 async def get_images(query: str):
     """Get multiple images from Unsplash based on search query"""
     try:
-        images = UnsplashAction.get_images(query)
-        return ZolaResponse(
+        images = await UnsplashAction.get_images(query)
+        return zola_response(
             status="success",
             data={"images": images}
         )
     except Exception as e:
-        return ZolaResponse(
+        return zola_response(
             status="error",
             data={"error": str(e)}
         )
@@ -86,20 +173,43 @@ async def pin_image(request_data: Dict[str, Any]):
     try:
         image_id = request_data.get('imageId')
         if not image_id:
-            return ZolaResponse(
+            return zola_response(
                 status="error",
                 data={"error": "imageId is required"}
             )
         
         # Fetch tags for the pinned image
-        tags = UnsplashAction.get_photo_tags(image_id)
+        tags = await UnsplashAction.get_photo_tags(image_id)
         
-        return ZolaResponse(
+        return zola_response(
             status="success",
             data={"imageId": image_id, "tags": tags}
         )
     except Exception as e:
-        return ZolaResponse(
+        return zola_response(
+            status="error",
+            data={"error": str(e)}
+        )
+
+@app.post("/pin-images", response_model=ZolaResponse)
+async def pin_images(request_data: Dict[str, Any]):
+    """Pin many images at once and fetch any tags we don't have yet"""
+    try:
+        image_ids = request_data.get('imageIds', [])
+        if not image_ids or not isinstance(image_ids, list) or not all(isinstance(i, str) for i in image_ids):
+            return zola_response(
+                status="error",
+                data={"error": "imageIds must be a non-empty list of strings"}
+            )
+        
+        tags = await UnsplashAction.get_tags_for_images(image_ids)
+        
+        return zola_response(
+            status="success",
+            data={"tags": tags}
+        )
+    except Exception as e:
+        return zola_response(
             status="error",
             data={"error": str(e)}
         )
@@ -108,47 +218,116 @@ async def pin_image(request_data: Dict[str, Any]):
 async def createItinerary(request_data: Dict[str, Any]):
     """Create itinerary based on plan data"""
     try:
+        # "noCache": true forces a fresh generation instead of a cached itinerary
+        use_cache = not request_data.pop('noCache', False)
         # Convert request data to Plan object
         plan = Plan(**request_data)
-        itinerary = OpenAiActions.createItinerary(plan)
-        print(itinerary)
-        return ZolaResponse(
+        itinerary = await OpenAiActions.createItinerary(plan, use_cache=use_cache)
+        log_sampled(logger, "Generated itinerary", itinerary, location=plan.location)
+        return zola_response(
             status="success",
             data=json.loads(itinerary)
         )
     except Exception as e:
-        return ZolaResponse(
+        return zola_response(
+            status="error",
+            data={"error": str(e)}
+        )
+
+@app.post("/create-itinerary/stream")
+async def create_itinerary_stream(request_data: Dict[str, Any]):
+    """
+    Stream an itinerary as Server-Sent Events:
+    "itinerary" events carry markdown chunks in order, "keywords" carries the
+    final query_keywords list, then "done" (or "error") ends the stream
+    """
+    try:
+        use_cache = not request_data.pop('noCache', False)
+        plan = Plan(**request_data)
+    except Exception as e:
+        return zola_response(
+            status="error",
+            data={"error": str(e)}
+        )
+
+    async def events():
+        try:
+            async for event, data in OpenAiActions.streamItinerary(plan, use_cache=use_cache):
+                if event == "itinerary":
+                    yield sse_event("itinerary", {"markdown": data})
+                elif event == "keywords":
+                    yield sse_event("keywords", {"query_keywords": data})
+            yield sse_event("done", {"status": "success"})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/plan-trip")
+async def plan_trip(request_data: Dict[str, Any]):
+    """
+    Generate an itinerary and its TripAdvisor locations on one SSE stream.
+    Emits "itinerary" (markdown chunk), "location" (one Location as soon as its
+    details resolve), "photo" (a location's photo_url, once found) and
+    "keywords" events, then "done" with the location count
+    """
+    try:
+        use_cache = not request_data.pop('noCache', False)
+        plan = Plan(**request_data)
+    except Exception as e:
+        return zola_response(
             status="error",
             data={"error": str(e)}
         )
 
+    async def events():
+        total_count = 0
+        try:
+            async for event, data in TripPlannerAction.plan_trip(plan, use_cache=use_cache):
+                if event == "itinerary":
+                    yield sse_event("itinerary", {"markdown": data})
+                elif event == "keywords":
+                    yield sse_event("keywords", {"query_keywords": data})
+                elif event == "location":
+                    total_count += 1
+                    yield sse_event("location", data)
+                elif event == "photo":
+                    yield sse_event("photo", data)
+            yield sse_event("done", {"status": "success", "total_count": total_count})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/get-locations", response_model=ZolaResponse)
 async def get_locations(request_data: Dict[str, Any]):
     """Get TripAdvisor locations for multiple queries"""
     try:
         queries = request_data.get('queries', [])
         if not queries or not isinstance(queries, list):
-            return ZolaResponse(
+            return zola_response(
                 status="error",
                 data={"error": "queries must be a non-empty list of strings"}
             )
         
-        all_locations = []
-        
-        for query in queries:
-            if not isinstance(query, str) or not query.strip():
-                continue
-                
-            try:
-                activities= TripAdvisorAction.get_locations(query.strip())
-                # Combine all location types
-                query_locations = activities
-                all_locations.extend(query_locations)
-            except Exception as e:
-                print(f"Error fetching locations for query '{query}': {e}")
-                continue
+        # Drop blank/duplicate keywords, then search them all concurrently;
+        # each unique location is only fetched once per request. Photos that
+        # are not cached yet are left out; clients fetch them from /location-photos
+        unique_queries = list(dict.fromkeys(
+            query.strip() for query in queries
+            if isinstance(query, str) and query.strip()
+        ))
+        all_locations = await TripAdvisorAction.get_locations_for_queries(unique_queries, include_photos=False)
         
-        return ZolaResponse(
+        return zola_response(
             status="success",
             data={
                 "locations": all_locations,
@@ -157,32 +336,71 @@ async def get_locations(request_data: Dict[str, Any]):
             }
         )
     except Exception as e:
-        return ZolaResponse(
+        return zola_response(
+            status="error",
+            data={"error": str(e)}
+        )
+
+@app.post("/get-locations/stream")
+async def get_locations_stream(request_data: Dict[str, Any]):
+    """
+    Stream TripAdvisor locations for multiple queries as NDJSON: one
+    {"type": "location", "location": {...}} line per location as soon as it is
+    fetched, then {"type": "done", "total_count", "queries_processed"}
+    (or {"type": "error", "error"}) ends the stream
+    """
+    queries = request_data.get('queries', [])
+    if not queries or not isinstance(queries, list):
+        return zola_response(
+            status="error",
+            data={"error": "queries must be a non-empty list of strings"}
+        )
+    unique_queries = list(dict.fromkeys(
+        query.strip() for query in queries
+        if isinstance(query, str) and query.strip()
+    ))
+
+    async def lines():
+        total_count = 0
+        try:
+            async for location in TripAdvisorAction.stream_locations_for_queries(unique_queries, include_photos=False):
+                total_count += 1
+                yield ndjson_line({"type": "location", "location": location})
+            yield ndjson_line({"type": "done", "total_count": total_count, "queries_processed": len(queries)})
+        except Exception as e:
+            yield ndjson_line({"type": "error", "error": str(e)})
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/location-photos", response_model=ZolaResponse)
+async def location_photos(request_data: Dict[str, Any]):
+    """Resolve photo URLs for many TripAdvisor locations; null for locations without a photo"""
+    try:
+        location_ids = request_data.get('locationIds', [])
+        if not location_ids or not isinstance(location_ids, list) or not all(isinstance(i, str) for i in location_ids):
+            return zola_response(
+                status="error",
+                data={"error": "locationIds must be a non-empty list of strings"}
+            )
+        
+        photos = await TripAdvisorAction.get_location_photos(location_ids)
+        
+        return zola_response(
+            status="success",
+            data={"photos": photos}
+        )
+    except Exception as e:
+        return zola_response(
             status="error",
             data={"error": str(e)}
         )
 
 # Run the application
 if __name__ == "__main__":
-    # Check if saved_images folder is empty and populate if needed
-    import os
-    saved_images_dir = os.path.join(os.path.dirname(__file__), 'saved_images')
-    
-    # Check if we need to populate images (goal: 150 images)
-    existing_folders = []
-    if os.path.exists(saved_images_dir):
-        existing_folders = [f for f in os.listdir(saved_images_dir) if f.startswith('image_')]
-    
-    if len(existing_folders) < 150:
-        print(f"🔄 Need to populate images (current: {len(existing_folders)}, target: 150)...")
-        saved_count = UnsplashAction.save_images()
-        if saved_count > 0:
-            print(f"✅ Successfully saved {saved_count} images for startup")
-        else:
-            print("❌ Failed to save images, will use API fallback")
-    else:
-        print(f"✅ Saved images folder has {len(existing_folders)} images, ready to serve")
-    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -6,4 +6,6 @@ class Image(BaseModel):
     url: str
     description: Optional[str] = ""
     altText: Optional[str] = ""
-    tags: List[str]
\ No newline at end of file
+    tags: List[str]
+    thumbUrl: Optional[str] = None     # resized variants, only for pooled images
+    mediumUrl: Optional[str] = None
\ No newline at end of file
@@ -6,11 +6,21 @@ Run this script before starting the server for the first time
 
 import os
 import sys
+import asyncio
 
 # Add the current directory to Python path to import our modules
 sys.path.append(os.path.dirname(__file__))
 
 from actions.unsplashActions import UnsplashAction
+from utils.http import close_async_client
+from actions.imageVariants import shutdown_executor
+
+async def download_images() -> int:
+    try:
+        return await UnsplashAction.save_images()
+    finally:
+        await close_async_client()
+        shutdown_executor()
 
 def main():
     print("🚀 Zola Image Setup Script")
@@ -50,7 +60,7 @@ def main():
     print()
     
     # Download images
-    saved_count = UnsplashAction.save_images()
+    saved_count = asyncio.run(download_images())
     
     print()
     print("=" * 50)
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Tests import the backend modules the same way main.py does, with the
+# cache and image pool in a scratch directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_scratch = tempfile.mkdtemp(prefix='zola-tests-')
+os.environ.setdefault('OPENAI_KEY', 'test')
+os.environ.setdefault('ZOLA_CACHE_PATH', os.path.join(_scratch, 'cache.sqlite3'))
+os.environ.setdefault('ZOLA_SAVED_IMAGES_DIR', os.path.join(_scratch, 'saved_images'))
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+import httpx
+from actions import openAiActions
+import main
+
+DELAY = 0.5
+REQUESTS = 5
+
+class _DelayedCompletions:
+    """
+    Stand-in for async_client.chat.completions whose create() takes DELAY seconds
+    """
+    def __init__(self):
+        self.with_raw_response = self
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(DELAY)
+        content = json.dumps({"itinerary": "### Day 1\n\nMorning: museum", "query_keywords": ["museum"]})
+        completion = SimpleNamespace(choices=[SimpleNamespace(
+            finish_reason="stop", message=SimpleNamespace(content=content, refusal=None),
+        )])
+        return SimpleNamespace(status_code=200, headers={}, parse=lambda: completion)
+
+def _plan(location: str) -> dict:
+    return {
+        "dateFrom": "2024-06-15T04:00:00.000Z", "dateTo": "2024-06-17T04:00:00.000Z",
+        "location": location, "numPeople": 2, "budget": "medium", "mood": "relaxing",
+        "images": [], "noCache": True,
+    }
+
+def test_concurrent_itinerary_requests_overlap(monkeypatch):
+    completions = _DelayedCompletions()
+    monkeypatch.setattr(openAiActions, "async_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.monotonic()
+            # Distinct plans, so the requests are not coalesced into one generation
+            responses = await asyncio.gather(*[
+                client.post("/create-itinerary", json=_plan(f"City {i}")) for i in range(REQUESTS)
+            ])
+            return time.monotonic() - start, responses
+
+    elapsed, responses = asyncio.run(run())
+    assert all(response.json()["status"] == "success" for response in responses)
+    assert completions.calls == REQUESTS
+    # Serialized calls would take REQUESTS * DELAY
+    assert elapsed < DELAY * 2
@@ -0,0 +1,15 @@
+import asyncio
+import httpx
+import pytest
+import main
+
+@pytest.mark.parametrize("path", ["/create-itinerary", "/create-itinerary/stream", "/plan-trip"])
+def test_invalid_plan_returns_error_envelope(path):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json={"foo": 1})
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.json()["status"] == "error"
@@ -0,0 +1,21 @@
+import asyncio
+from actions import openAiActions
+from actions.openAiActions import OpenAiActions
+from utils.cache import lease_held
+
+def test_lease_is_renewed_while_generating(monkeypatch):
+    monkeypatch.setattr(openAiActions, "ITINERARY_LEASE_SECONDS", 0.3)
+    lease_key = "itinerary:lease-test"
+    held = []
+
+    async def generate(plan, cache_key):
+        # Outlive the lease TTL several times over
+        for _ in range(4):
+            await asyncio.sleep(0.25)
+            held.append(lease_held(lease_key))
+        return "{}"
+    monkeypatch.setattr(OpenAiActions, "_generate", staticmethod(generate))
+
+    asyncio.run(OpenAiActions._create_once(None, "lease-test"))
+    assert held == [True] * 4
+    assert not lease_held(lease_key)
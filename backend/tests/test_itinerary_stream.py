@@ -0,0 +1,52 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from actions.openAiActions import OpenAiActions, itinerary_cache
+from schema.Plan import Plan
+from utils.streaming import ItineraryStreamParser
+
+ENVELOPE = json.dumps({"itinerary": "### Day 1\n\nMorning: cafe\n\nEvening: river walk", "query_keywords": ["Paris cafe"]})
+
+PLAN = Plan(
+    dateFrom="2024-06-15T04:00:00.000Z", dateTo="2024-06-16T04:00:00.000Z",
+    location="Paris", numPeople=2, budget="medium", mood="relaxing", images=[],
+)
+
+def _chunk(content, finish_reason=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)])
+
+def _fake_completion(text, finish_reason):
+    async def create(**kwargs):
+        async def stream():
+            for i in range(0, len(text), 5):
+                yield _chunk(text[i:i + 5])
+            yield _chunk(None, finish_reason)
+        return stream()
+    return create
+
+def _run_stream(monkeypatch, text, finish_reason, cache_key):
+    monkeypatch.setattr(OpenAiActions, '_create_completion', staticmethod(_fake_completion(text, finish_reason)))
+
+    async def collect():
+        return [event async for event in OpenAiActions._stream(PLAN, cache_key, False)]
+    return asyncio.run(collect())
+
+def test_parser_rejects_truncated_envelope():
+    parser = ItineraryStreamParser()
+    parser.feed(ENVELOPE[:45])
+    parser.close()
+    assert parser.parsed() is None
+    assert parser.result['itinerary']
+
+def test_truncated_stream_is_not_cached(monkeypatch):
+    _run_stream(monkeypatch, ENVELOPE[:45], "length", "test:truncated")
+    assert itinerary_cache.get("test:truncated") is None
+
+def test_length_finish_is_not_cached_even_if_parseable(monkeypatch):
+    _run_stream(monkeypatch, ENVELOPE, "length", "test:length")
+    assert itinerary_cache.get("test:length") is None
+
+def test_complete_stream_is_cached(monkeypatch):
+    events = _run_stream(monkeypatch, ENVELOPE, "stop", "test:complete")
+    assert events[-1] == ("keywords", ["Paris cafe"])
+    assert json.loads(itinerary_cache.get("test:complete")) == json.loads(ENVELOPE)
@@ -0,0 +1,33 @@
+import sqlite3
+import time
+from utils import cache
+from utils.cache import PersistentCache
+
+def test_locked_database_does_not_stall_writes():
+    store = PersistentCache('test_locked', ttl_seconds=60, max_entries=10)
+    store.set('before', 1)
+
+    # Another worker holding the write lock
+    other = sqlite3.connect(cache.CACHE_PATH, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        start = time.monotonic()
+        store.set('during', 2)
+        assert time.monotonic() - start < 1
+        # WAL readers are not blocked by the writer
+        assert store.get('before') == 1
+    finally:
+        other.execute('ROLLBACK')
+        other.close()
+
+    assert store.get('during') is None
+    store.set('after', 3)
+    assert store.get('after') == 3
+
+def test_eviction_runs_in_the_background(monkeypatch):
+    monkeypatch.setattr(cache, 'EVICT_EVERY', 5)
+    store = PersistentCache('test_evict', ttl_seconds=60, max_entries=3)
+    for i in range(5):
+        store.set(str(i), i)
+    cache._maintenance.submit(lambda: None).result(timeout=5)
+    assert [store.get(str(i)) for i in range(5)] == [None, None, 2, 3, 4]
@@ -0,0 +1,26 @@
+from actions.openAiActions import _parse_date, itinerary_token_budget, plan_cache_key, trip_days
+from schema.Plan import Plan
+
+def frontend_plan(date_from: str, date_to: str) -> Plan:
+    # Dates as sent by the frontend (Date.toISOString())
+    return Plan(dateFrom=date_from, dateTo=date_to, location="Lisbon",
+                numPeople=2, budget="medium", mood="relaxing", images=[])
+
+def test_parses_utc_timestamps_from_the_frontend():
+    parsed = _parse_date("2024-06-15T04:00:00.000Z")
+    assert parsed is not None
+    assert parsed.utcoffset().total_seconds() == 0
+    assert parsed.date().isoformat() == "2024-06-15"
+
+def test_trip_days_uses_frontend_dates():
+    plan = frontend_plan("2024-06-14T22:00:00.000Z", "2024-06-23T22:00:00.000Z")
+    assert trip_days(plan) == 10
+    assert itinerary_token_budget(plan) > itinerary_token_budget(
+        frontend_plan("2024-06-14T22:00:00.000Z", "2024-06-15T22:00:00.000Z"))
+
+def test_cache_key_ignores_time_of_day():
+    assert plan_cache_key(frontend_plan("2024-06-15T04:00:00.000Z", "2024-06-20T04:00:00.000Z")) == \
+        plan_cache_key(frontend_plan("2024-06-15T09:30:00.000Z", "2024-06-20T18:00:00.000Z"))
+
+def test_unparseable_dates_fall_back_to_default_length():
+    assert _parse_date("next week") is None
@@ -0,0 +1,30 @@
+import json
+import os
+import time
+from actions import poolReplenisher
+from actions.unsplashActions import UnsplashAction
+from schema.Image import Image
+
+def _pool_image(images_dir, image_id, saved_at):
+    folder = os.path.join(images_dir, f"image_{image_id}")
+    os.makedirs(folder)
+    open(os.path.join(folder, 'image.jpg'), 'wb').close()
+    image = Image(id=image_id, url=f"https://images.example/{image_id}.jpg", tags=[])
+    with open(os.path.join(folder, 'metadata.json'), 'w') as f:
+        json.dump({**image.dict(), 'savedAt': saved_at}, f)
+    return image
+
+def test_tag_write_back_keeps_image_age(tmp_path, monkeypatch):
+    images_dir = str(tmp_path)
+    monkeypatch.setattr(poolReplenisher, 'SAVED_IMAGES_DIR', images_dir)
+    monkeypatch.setattr('actions.unsplashActions.SAVED_IMAGES_DIR', images_dir)
+    old = time.time() - poolReplenisher.POOL_MAX_AGE_SECONDS - 60
+    image = _pool_image(images_dir, 'old', old)
+
+    # Pinning rewrites metadata.json with the fetched tags
+    UnsplashAction._write_pooled_metadata([image.copy(update={'tags': ['beach']})])
+
+    with open(os.path.join(images_dir, 'image_old', 'metadata.json')) as f:
+        metadata = json.load(f)
+    assert metadata['tags'] == ['beach']
+    assert poolReplenisher._saved_at('old') == old
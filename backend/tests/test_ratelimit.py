@@ -0,0 +1,44 @@
+import asyncio
+import time
+from utils.ratelimit import ProviderScheduler
+
+def test_exhausted_quota_recovers_when_window_resets():
+    scheduler = ProviderScheduler('test', rate_per_second=100, burst=5, window_seconds=0.3)
+    scheduler.update_from_response(200, {'x-ratelimit-remaining': '0'})
+
+    async def acquire():
+        start = time.monotonic()
+        await asyncio.wait_for(scheduler.acquire(), timeout=2)
+        return time.monotonic() - start
+
+    waited = asyncio.run(acquire())
+    assert 0.2 <= waited < 1
+    assert scheduler.rate == scheduler.base_rate
+
+def test_reset_header_sets_window_end():
+    scheduler = ProviderScheduler('test', rate_per_second=100, burst=5, window_seconds=3600)
+    scheduler.update_from_response(200, {
+        'x-ratelimit-remaining-requests': '0',
+        'x-ratelimit-reset-requests': '200ms',
+    })
+
+    async def acquire():
+        start = time.monotonic()
+        await asyncio.wait_for(scheduler.acquire(), timeout=2)
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire()) < 1
+
+def test_remaining_quota_paces_until_reset():
+    scheduler = ProviderScheduler('test', rate_per_second=100, burst=5, window_seconds=10)
+    scheduler.update_from_response(200, {'x-ratelimit-remaining': '5'})
+    assert scheduler.rate == 0.5
+
+def test_limits_are_split_between_workers():
+    scheduler = ProviderScheduler('test', rate_per_second=50, burst=50, window_seconds=1, workers=4)
+    assert scheduler.base_rate == 12.5
+    assert scheduler.burst == 12.5
+
+    # Quota reported by the provider is shared by every worker too
+    scheduler.update_from_response(200, {'x-ratelimit-remaining': '20'})
+    assert scheduler.rate == 5
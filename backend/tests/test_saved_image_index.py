@@ -0,0 +1,56 @@
+import json
+import time
+from actions import savedImageIndex
+from actions.savedImageIndex import SavedImageIndex
+from schema.Image import Image
+
+def _image(image_id: str, tags=()) -> Image:
+    return Image(id=image_id, url=f"https://images.example/{image_id}.jpg", tags=list(tags))
+
+def _index(tmp_path) -> SavedImageIndex:
+    index = SavedImageIndex(str(tmp_path), str(tmp_path / 'manifest.json'))
+    index.load()
+    return index
+
+def _manifest_ids(tmp_path):
+    with open(tmp_path / 'manifest.json') as f:
+        return [image['id'] for image in json.load(f)['images']]
+
+def test_concurrent_writers_merge_instead_of_overwriting(tmp_path):
+    worker_a = _index(tmp_path)
+    worker_b = _index(tmp_path)
+    worker_a.add([_image('a'), _image('b')])
+    worker_b.load()
+
+    worker_a.add([_image('c'), _image('d')])
+    # worker_b's in-memory copy is stale; its write must not drop c and d
+    worker_b.add([_image('a', tags=['beach'])])
+
+    assert _manifest_ids(tmp_path) == ['a', 'b', 'c', 'd']
+    worker_a.load()
+    assert worker_a.get('a').tags == ['beach']
+    assert set(worker_a.ids()) == {'a', 'b', 'c', 'd'}
+
+def test_removed_images_stay_removed(tmp_path):
+    worker_a = _index(tmp_path)
+    worker_b = _index(tmp_path)
+    worker_a.add([_image('a'), _image('b')])
+    worker_b.load()
+
+    worker_a.remove(['b'])
+    worker_b.add([_image('c')])
+
+    assert _manifest_ids(tmp_path) == ['a', 'c']
+
+def test_changed_manifest_reloads_off_the_request_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(savedImageIndex, 'INDEX_REFRESH_SECONDS', 0)
+    reader = _index(tmp_path)
+    writer = _index(tmp_path)
+    writer.add([_image('a')])
+
+    # The first lookup after the change still serves the old snapshot
+    assert reader.get('a') is None
+    deadline = time.monotonic() + 2
+    while reader.get('a') is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reader.get('a') is not None
@@ -0,0 +1,38 @@
+import asyncio
+from actions import tripAdvisorActions, unsplashActions
+from actions.tripAdvisorActions import TripAdvisorAction
+from actions.unsplashActions import UnsplashAction
+from utils.cache import unique_queries
+
+def test_unique_queries_keeps_first_spelling():
+    assert unique_queries(["The Hague ", "the hague!", "  ", "St. Peter's"]) == ["The Hague", "St. Peter's"]
+
+def test_tripadvisor_searches_original_query_and_caches_normalized(monkeypatch):
+    sent = []
+    async def get(path, params):
+        sent.append(params["searchQuery"])
+        return {"data": [{"location_id": 1}]}
+    monkeypatch.setattr(TripAdvisorAction, "_get", staticmethod(get))
+    monkeypatch.setattr(tripAdvisorActions, "search_cache", tripAdvisorActions.TTLCache(16, 60))
+
+    async def run():
+        await TripAdvisorAction._get_location_by_query("A Coruña")
+        return await TripAdvisorAction._get_location_by_query("a coruña!")
+
+    assert asyncio.run(run()) == ["1"]
+    assert sent == ["A Coruña"]
+
+def test_unsplash_searches_original_query(monkeypatch):
+    sent = []
+    async def search_images(query):
+        sent.append(query)
+        return []
+    monkeypatch.setattr(UnsplashAction, "_search_images", staticmethod(search_images))
+    monkeypatch.setattr(unsplashActions, "search_cache", unsplashActions.TTLCache(16, 60))
+
+    async def run():
+        await UnsplashAction.get_images(" L'Avenue ")
+        await UnsplashAction.get_images("l avenue")
+
+    asyncio.run(run())
+    assert sent == ["L'Avenue"]
@@ -0,0 +1,76 @@
+import asyncio
+import httpx
+import pytest
+from actions.openAiActions import OPENAI_MAX_TOKENS, OpenAiActions
+from schema.Plan import Plan
+import main
+
+YEAR_PLAN = {
+    "dateFrom": "2025-01-01T00:00:00.000Z", "dateTo": "2025-12-31T00:00:00.000Z",
+    "location": "Lisbon", "numPeople": 2, "budget": "medium", "mood": "relaxing", "images": [],
+}
+
+def test_overlong_trip_is_rejected_without_upstream_calls(monkeypatch):
+    calls = []
+    async def create_completion(**kwargs):
+        calls.append(kwargs)
+    monkeypatch.setattr(OpenAiActions, "_create_completion", staticmethod(create_completion))
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/create-itinerary", json=YEAR_PLAN)
+
+    body = asyncio.run(run()).json()
+    assert body["status"] == "error"
+    assert "at most" in body["data"]["error"]
+    assert calls == []
+
+def test_outline_budget_is_clamped(monkeypatch):
+    budgets = []
+    async def create_json_completion(prompt, response_format, max_tokens):
+        budgets.append(max_tokens)
+        return {"days": [], "query_keywords": []}
+    monkeypatch.setattr(OpenAiActions, "_create_json_completion", staticmethod(create_json_completion))
+
+    asyncio.run(OpenAiActions._generate_outline(Plan(**YEAR_PLAN), 365))
+    assert budgets == [OPENAI_MAX_TOKENS]
+
+class FakeCompletion:
+    def __init__(self, finish_reason, content):
+        message = type("Message", (), {"content": content, "refusal": None})()
+        choice = type("Choice", (), {"finish_reason": finish_reason, "message": message})()
+        self.choices = [choice]
+
+def test_truncated_section_is_retried_with_full_budget(monkeypatch):
+    budgets = []
+    async def create_completion(**kwargs):
+        budgets.append(kwargs["max_tokens"])
+        if len(budgets) == 1:
+            return FakeCompletion("length", '{"markdown": "### Day 1')
+        return FakeCompletion("stop", '{"markdown": "### Day 1", "query_keywords": []}')
+    monkeypatch.setattr(OpenAiActions, "_create_completion", staticmethod(create_completion))
+
+    section = asyncio.run(OpenAiActions._generate_day(Plan(**YEAR_PLAN), 1, [{"theme": "", "areas": []}]))
+    assert section["markdown"] == "### Day 1"
+    assert budgets[1] == OPENAI_MAX_TOKENS > budgets[0]
+
+def test_section_over_full_budget_fails_clearly(monkeypatch):
+    async def create_completion(**kwargs):
+        return FakeCompletion("length", '{"markdown": "### Day 1')
+    monkeypatch.setattr(OpenAiActions, "_create_completion", staticmethod(create_completion))
+
+    with pytest.raises(ValueError, match="did not fit"):
+        asyncio.run(OpenAiActions._generate_day(Plan(**YEAR_PLAN), 1, [{"theme": "", "areas": []}]))
+
+def test_day_heading_has_no_server_computed_date(monkeypatch):
+    prompts = []
+    async def create_json_completion(prompt, response_format, max_tokens):
+        prompts.append(prompt)
+        return {"markdown": "", "query_keywords": []}
+    monkeypatch.setattr(OpenAiActions, "_create_json_completion", staticmethod(create_json_completion))
+
+    plan = Plan(**{**YEAR_PLAN, "dateFrom": "2024-06-14T22:00:00.000Z", "dateTo": "2024-06-19T22:00:00.000Z"})
+    asyncio.run(OpenAiActions._generate_day(plan, 1, [{"theme": "", "areas": []}] * 6))
+    assert '"### Day 1"' in prompts[0]
+    assert "2024-06-14" not in prompts[0]
@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+from utils.metrics import record_cache_lookup
+from utils.log import get_logger
+
+logger = get_logger('cache')
+
+# SQLite file shared by every uvicorn worker on this node
+CACHE_PATH = os.getenv('ZOLA_CACHE_PATH', os.path.join(os.path.dirname(__file__), '..', 'zola_cache.sqlite3'))
+# Run expiry/size eviction once every N writes per namespace
+EVICT_EVERY = 100
+# Cache calls run on the event loop, so they wait at most this long (seconds)
+# for another worker's write lock; a locked read is a miss, a locked write is skipped
+CACHE_BUSY_TIMEOUT = float(os.getenv('ZOLA_CACHE_BUSY_TIMEOUT', '0.05'))
+# Eviction runs on a background thread and may wait longer
+EVICT_BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+# One thread for eviction, so deletes never hold up a request
+_maintenance = ThreadPoolExecutor(max_workers=1, thread_name_prefix='zola-cache-evict')
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a free-text search query used as a cache key:
+    "The Eiffel Tower!" / "eiffel  tower" -> "eiffel tower"
+    """
+    text = unicodedata.normalize('NFKC', query).casefold()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r'^(the|a|an) ', '', text)
+    return text
+
+def unique_queries(queries: List[str]) -> List[str]:
+    """
+    First spelling of each distinct query (by normalize_query), blanks dropped.
+    Queries are sent upstream as written; the normalized form is only a key.
+    """
+    unique = {}
+    for query in queries:
+        key = normalize_query(query)
+        if key and key not in unique:
+            unique[key] = query.strip()
+    return list(unique.values())
+
+class TTLCache:
+    """
+    In-memory LRU cache with a per-entry TTL, local to one worker process.
+    With stale_seconds > 0, expired entries are kept that much longer so
+    get_entry() can serve them while they are refreshed (stale-while-revalidate).
+    Meant to be used from the event loop thread only. name labels its
+    hit/miss metrics.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float, stale_seconds: float = 0, name: str = 'memory'):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries = OrderedDict()
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """
+        Return (value, is_fresh), or None if missing or past its stale window
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            record_cache_lookup(self.name, 'miss')
+            return None
+        expires_at, value = entry
+        now = time.monotonic()
+        if expires_at + self.stale_seconds < now:
+            del self._entries[key]
+            record_cache_lookup(self.name, 'miss')
+            return None
+        self._entries.move_to_end(key)
+        fresh = expires_at >= now
+        record_cache_lookup(self.name, 'hit' if fresh else 'stale')
+        return value, fresh
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value, or None if missing or expired
+        """
+        entry = self.get_entry(key)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0]
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+def _get_connection() -> sqlite3.Connection:
+    """
+    One connection per thread and process (sqlite connections can't cross either)
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid():
+        conn = sqlite3.connect(CACHE_PATH, timeout=CACHE_BUSY_TIMEOUT, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (namespace, stored_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+def _log_failure(action: str, name: str, error: sqlite3.Error):
+    # Lock contention between workers is expected under load; anything else is not
+    if isinstance(error, sqlite3.OperationalError) and 'locked' in str(error):
+        logger.debug("%s skipped, database busy (%s)", action, name)
+    else:
+        logger.error("%s failed (%s): %s", action, name, error)
+
+class PersistentCache:
+    """
+    JSON key/value cache stored in SQLite with a TTL and a maximum number of
+    entries per namespace. Survives restarts and is shared between workers.
+    """
+    def __init__(self, namespace: str, ttl_seconds: float, max_entries: int):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+
+    def get(self, key: str, stored_after: float = 0) -> Optional[Any]:
+        """
+        Return the cached value, or None if missing, expired or (with
+        stored_after) written before that time
+        """
+        try:
+            row = _get_connection().execute(
+                'SELECT value, expires_at, stored_at FROM cache WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            _log_failure("Cache read", self.namespace, e)
+            record_cache_lookup(self.namespace, 'miss')
+            return None
+        if row is None or row[1] < time.time() or row[2] < stored_after:
+            record_cache_lookup(self.namespace, 'miss')
+            return None
+        record_cache_lookup(self.namespace, 'hit')
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        """
+        Store a JSON-serializable value under key
+        """
+        now = time.time()
+        try:
+            _get_connection().execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, json.dumps(value), now, now + self.ttl_seconds)
+            )
+        except sqlite3.Error as e:
+            _log_failure("Cache write", self.namespace, e)
+            return
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            _maintenance.submit(self._evict_in_background)
+
+    def _evict_in_background(self):
+        try:
+            self.evict()
+        except sqlite3.Error as e:
+            _log_failure("Cache eviction", self.namespace, e)
+
+    def evict(self):
+        """
+        Drop expired entries, then the oldest entries beyond max_entries
+        """
+        conn = _get_connection()
+        conn.execute(f'PRAGMA busy_timeout = {EVICT_BUSY_TIMEOUT_MS}')
+        conn.execute(
+            'DELETE FROM cache WHERE namespace = ? AND expires_at < ?',
+            (self.namespace, time.time())
+        )
+        conn.execute('''
+            DELETE FROM cache WHERE namespace = ? AND key IN (
+                SELECT key FROM cache WHERE namespace = ?
+                ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.namespace, self.namespace, self.max_entries))
+
+def acquire_lease(key: str, ttl_seconds: float) -> Optional[str]:
+    """
+    Try to take a named lease shared by every worker on this node.
+    Returns a token for release_lease(), or None if someone else holds it.
+    Leases expire after ttl_seconds so a crashed holder can't block others.
+    """
+    token = f"{os.getpid()}-{uuid.uuid4().hex}"
+    now = time.time()
+    try:
+        conn = _get_connection()
+        conn.execute('DELETE FROM leases WHERE key = ? AND expires_at < ?', (key, now))
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO leases (key, token, expires_at) VALUES (?, ?, ?)',
+            (key, token, now + ttl_seconds)
+        )
+    except sqlite3.Error as e:
+        _log_failure("Lease acquire", key, e)
+        return token
+    return token if cursor.rowcount == 1 else None
+
+def lease_held(key: str) -> bool:
+    try:
+        row = _get_connection().execute(
+            'SELECT 1 FROM leases WHERE key = ? AND expires_at >= ?', (key, time.time())
+        ).fetchone()
+    except sqlite3.Error as e:
+        _log_failure("Lease check", key, e)
+        return False
+    return row is not None
+
+def renew_lease(key: str, token: str, ttl_seconds: float) -> bool:
+    """
+    Push a held lease's expiry ttl_seconds from now. Returns False if the
+    lease was lost (it expired and someone else took it)
+    """
+    try:
+        cursor = _get_connection().execute(
+            'UPDATE leases SET expires_at = ? WHERE key = ? AND token = ?',
+            (time.time() + ttl_seconds, key, token)
+        )
+    except sqlite3.Error as e:
+        _log_failure("Lease renew", key, e)
+        return True
+    return cursor.rowcount == 1
+
+def release_lease(key: str, token: str):
+    try:
+        _get_connection().execute('DELETE FROM leases WHERE key = ? AND token = ?', (key, token))
+    except sqlite3.Error as e:
+        _log_failure("Lease release", key, e)
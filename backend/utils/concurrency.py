@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller starts the
+    work, later callers await the same result instead of repeating it.
+    """
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one caller disconnecting must not cancel the shared work
+        return await asyncio.shield(future)
+
+class StreamBroadcast:
+    """
+    Runs one async iterator in its own task and replays its items to any
+    number of subscribers; late subscribers get everything from the start.
+    The source keeps running when subscribers disconnect.
+    """
+    def __init__(self, source: AsyncIterator[Any]):
+        self._items: List[Any] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run(source))
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _run(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                self._items.append(item)
+                self._notify()
+        except BaseException as e:
+            self._error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            while index < len(self._items):
+                yield self._items[index]
+                index += 1
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return
+            await self._changed.wait()
+
+class StreamFlight:
+    """
+    SingleFlight for streams: concurrent callers with the same key share one
+    running source and each receive all of its items
+    """
+    def __init__(self):
+        self._inflight: Dict[str, StreamBroadcast] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def stream(self, key: str, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        broadcast = self._inflight.get(key)
+        if broadcast is None:
+            broadcast = StreamBroadcast(fn())
+            self._inflight[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return broadcast.subscribe()
@@ -0,0 +1,49 @@
+import os
+from typing import Optional
+import httpx
+from utils.ratelimit import get_scheduler
+from utils.metrics import upstream_call
+
+# Shared, pooled HTTP client used by every upstream action class
+HTTP_TIMEOUT = float(os.getenv('ZOLA_HTTP_TIMEOUT', '20'))
+HTTP_MAX_CONNECTIONS = int(os.getenv('ZOLA_HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('ZOLA_HTTP_MAX_KEEPALIVE', '20'))
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide AsyncClient, creating it on first use
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE
+            )
+        )
+    return _client
+
+async def close_async_client():
+    """
+    Close the shared AsyncClient (called on application shutdown)
+    """
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+async def scheduled_get(provider: str, url: str, params: Optional[dict] = None, priority: Optional[int] = None) -> httpx.Response:
+    """
+    GET an upstream API through the provider's rate-limit scheduler and
+    feed the response's rate-limit headers back into it
+    """
+    scheduler = get_scheduler(provider)
+    async with upstream_call(provider) as call:
+        await scheduler.acquire(priority)
+        response = await get_async_client().get(url, params=params)
+        call.status = response.status_code
+    scheduler.update_from_response(response.status_code, response.headers)
+    return response
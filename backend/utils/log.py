@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+from utils.tracing import current_span
+
+# ZOLA_LOG_LEVEL: DEBUG, INFO, WARNING, ERROR
+LOG_LEVEL = os.getenv('ZOLA_LOG_LEVEL', 'INFO').upper()
+# ZOLA_LOG_FORMAT: json (one object per line) or text
+LOG_FORMAT = os.getenv('ZOLA_LOG_FORMAT', 'json')
+# Fraction of high-volume debug payloads (API responses, itineraries) that are logged
+LOG_SAMPLE_RATE = float(os.getenv('ZOLA_LOG_SAMPLE_RATE', '0.01'))
+# Records waiting for the writer thread; beyond this they are dropped, never waited on
+LOG_QUEUE_SIZE = int(os.getenv('ZOLA_LOG_QUEUE_SIZE', '10000'))
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with extra= fields and the active trace IDs
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking when the queue is full
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only interpolate the message here; serialization happens on the writer thread
+        record = super().prepare(record)
+        span = current_span()
+        if hasattr(span, 'trace'):
+            record.trace_id = span.trace.trace_id
+            record.span_id = span.span_id
+        return record
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+        return message
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+def setup_logging():
+    """
+    Route every zola.* logger through a bounded queue to a writer thread.
+    Called on first get_logger(); safe to call again.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == 'json':
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root = logging.getLogger('zola')
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_DroppingQueueHandler(log_queue))
+        root.propagate = False
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f'zola.{name}')
+
+def log_sampled(logger: logging.Logger, message: str, payload: Any, **fields):
+    """
+    Log a large debug payload for a sample (ZOLA_LOG_SAMPLE_RATE) of calls.
+    Costs one level check when DEBUG is off.
+    """
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE:
+        logger.debug(message, extra={'payload': payload, **fields})
@@ -0,0 +1,209 @@
+import os
+import time
+import functools
+import inspect
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+from utils.tracing import CLIENT, activate, deactivate, span
+
+# prometheus_client is optional: without it every metric is a no-op and
+# /metrics reports that metrics are unavailable
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess,
+    )
+except ImportError:
+    Counter = Gauge = Histogram = None
+
+# With several uvicorn workers, point PROMETHEUS_MULTIPROC_DIR at an empty
+# directory shared by all of them and /metrics aggregates every worker
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def observe(self, amount: float):
+        pass
+
+METRICS_ENABLED = Counter is not None
+
+if METRICS_ENABLED:
+    REQUEST_LATENCY = Histogram(
+        'zola_request_duration_seconds', 'Time to serve an API request, including streamed bodies',
+        ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+    )
+    REQUESTS_IN_FLIGHT = Gauge(
+        'zola_requests_in_flight', 'API requests currently being served',
+        multiprocess_mode='livesum'
+    )
+    UPSTREAM_LATENCY = Histogram(
+        'zola_upstream_duration_seconds', 'Time for one upstream API call, including rate-limit waits',
+        ['provider', 'method'], buckets=LATENCY_BUCKETS
+    )
+    UPSTREAM_ERRORS = Counter(
+        'zola_upstream_errors_total', 'Failed upstream API calls',
+        ['provider', 'method', 'reason']
+    )
+    UPSTREAM_IN_FLIGHT = Gauge(
+        'zola_upstream_in_flight', 'Upstream API calls currently in flight',
+        ['provider'], multiprocess_mode='livesum'
+    )
+    CACHE_REQUESTS = Counter(
+        'zola_cache_requests_total', 'Cache lookups by result (hit, stale or miss)',
+        ['cache', 'result']
+    )
+else:
+    REQUEST_LATENCY = REQUESTS_IN_FLIGHT = UPSTREAM_LATENCY = UPSTREAM_ERRORS = UPSTREAM_IN_FLIGHT = CACHE_REQUESTS = _NoopMetric()
+
+# Action method that is currently calling an upstream API, set by @observe_upstream
+_upstream_method: ContextVar[str] = ContextVar('upstream_method', default='unknown')
+
+def _span_attributes(args: tuple) -> dict:
+    # The first argument identifies the call (location ID, query, photo ID)
+    if args and isinstance(args[0], str):
+        return {'zola.arg': args[0][:100]}
+    return {}
+
+def observe_upstream(fn):
+    """
+    Label the upstream calls made inside an action method with its name
+    (e.g. "TripAdvisorAction._get_location_details"), so latency and errors
+    get one series per method, and record the method as a tracing span.
+    Works on coroutines and async generators.
+    """
+    method = fn.__qualname__
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def generator_wrapper(*args, **kwargs):
+            generator = fn(*args, **kwargs)
+            method_span = span(method, **_span_attributes(args)).start()
+            error = None
+            try:
+                while True:
+                    # The generator runs in its consumer's context, so the label
+                    # and span are only active while it is being advanced
+                    token = _upstream_method.set(method)
+                    span_token = activate(method_span)
+                    try:
+                        item = await generator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        deactivate(span_token)
+                        _upstream_method.reset(token)
+                    yield item
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                await generator.aclose()
+                method_span.finish(error if isinstance(error, Exception) else None)
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = _upstream_method.set(method)
+        try:
+            with span(method, **_span_attributes(args)):
+                return await fn(*args, **kwargs)
+        finally:
+            _upstream_method.reset(token)
+    return wrapper
+
+class UpstreamCall:
+    """
+    Handle yielded by upstream_call(); set status once the response arrives
+    """
+    def __init__(self):
+        self.status: Optional[int] = None
+
+@asynccontextmanager
+async def upstream_call(provider: str):
+    """
+    Time one upstream API call and count it as an error if it raises or
+    the status set on the yielded handle is 4xx/5xx. The call is also
+    recorded as a client span named after the provider.
+    """
+    method = _upstream_method.get()
+    call = UpstreamCall()
+    start = time.perf_counter()
+    UPSTREAM_IN_FLIGHT.labels(provider).inc()
+    try:
+        with span(provider, kind=CLIENT, **{'zola.method': method}) as call_span:
+            yield call
+            if call.status is not None:
+                call_span.set_attribute('http.status_code', call.status)
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(provider, method, type(e).__name__).inc()
+        raise
+    else:
+        if call.status is not None and call.status >= 400:
+            UPSTREAM_ERRORS.labels(provider, method, str(call.status)).inc()
+    finally:
+        UPSTREAM_IN_FLIGHT.labels(provider).dec()
+        UPSTREAM_LATENCY.labels(provider, method).observe(time.perf_counter() - start)
+
+def record_cache_lookup(cache: str, result: str):
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency (until the last body chunk is sent)
+    and in-flight count for every HTTP request, labelled by route template
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Route templates keep the label set small (/saved-images/{image_id}/{filename})
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            REQUEST_LATENCY.labels(scope['method'], route_path, str(status)).observe(time.perf_counter() - start)
+
+def render_metrics() -> Tuple[int, bytes, str]:
+    """
+    Return (status, body, content type) for the /metrics endpoint
+    """
+    if not METRICS_ENABLED:
+        return 503, b'# prometheus_client is not installed\n', 'text/plain; charset=utf-8'
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return 200, generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_worker_dead():
+    """
+    Drop this worker's live gauges from the multiprocess files on shutdown
+    """
+    if METRICS_ENABLED and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+import heapq
+import asyncio
+import itertools
+from contextvars import ContextVar
+from typing import Dict, Mapping, Optional
+from utils.log import get_logger
+
+logger = get_logger('ratelimit')
+
+# Lower value = served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# Priority for upstream calls made in the current task; background jobs set BACKGROUND
+request_priority: ContextVar[int] = ContextVar('request_priority', default=INTERACTIVE)
+
+# Serving workers on this node. Buckets live in each worker, so every provider
+# limit is split evenly between them to keep the node as a whole within it
+RATE_LIMIT_WORKERS = max(1, int(os.getenv('ZOLA_WORKERS', os.getenv('WEB_CONCURRENCY', '1'))))
+
+def _parse_duration(value: str) -> Optional[float]:
+    """
+    Parse OpenAI-style reset durations ("1s", "6m0s", "120ms") into seconds
+    """
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    parts = re.findall(r'([\d.]+)(ms|s|m|h)', value or '')
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+class ProviderScheduler:
+    """
+    Token bucket with a priority wait queue for one upstream provider.
+
+    Callers await acquire() before each API call. Tokens refill at
+    rate_per_second up to burst; when none are left, waiters are served in
+    priority order (INTERACTIVE before BACKGROUND, then FIFO). After each
+    call, update_from_response() paces the bucket to the quota the provider
+    reports as remaining, and a 429 pauses the provider until Retry-After.
+    With workers > 1, this bucket gets a 1/workers share of the rate, burst
+    and reported quota.
+    """
+    def __init__(self, name: str, rate_per_second: float, burst: float, window_seconds: float, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.base_rate = rate_per_second / workers
+        self.rate = self.base_rate
+        self.burst = max(1.0, burst / workers)
+        self.window_seconds = window_seconds
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        # When the provider's current quota window ends; rate and tokens are restored then
+        self._window_reset_at = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._window_reset_at and now >= self._window_reset_at:
+            # A new window starts with the provider's full quota
+            self.rate = self.base_rate
+            self._tokens = self.burst
+            self._window_reset_at = 0.0
+        else:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _time_until_token(self) -> float:
+        self._refill()
+        now = time.monotonic()
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            return 0.0
+        until_reset = self._window_reset_at - now if self._window_reset_at else None
+        if self.rate <= 0:
+            return until_reset if until_reset is not None else 1.0
+        wait = (1 - self._tokens) / self.rate
+        return min(wait, until_reset) if until_reset is not None else wait
+
+    async def acquire(self, priority: Optional[int] = None):
+        if priority is None:
+            priority = request_priority.get()
+        if not self._waiters and self._time_until_token() == 0:
+            self._tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.ensure_future(self._pump())
+        await future
+
+    async def _pump(self):
+        """
+        Hand out tokens to waiters, highest priority first, as they refill
+        """
+        while self._waiters:
+            if self._waiters[0][2].done():
+                # The waiter was cancelled
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._time_until_token()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            self._tokens -= 1
+            _, _, future = heapq.heappop(self._waiters)
+            future.set_result(None)
+
+    def update_from_response(self, status_code: int, headers: Mapping[str, str]):
+        """
+        Adapt to the provider's own rate-limit signals
+        """
+        remaining = headers.get('x-ratelimit-remaining') or headers.get('x-ratelimit-remaining-requests')
+        if remaining is not None:
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                remaining = None
+        if remaining is not None:
+            # The quota left is for the API key, which every worker shares
+            remaining /= self.workers
+            reset = _parse_duration(headers.get('x-ratelimit-reset-requests', ''))
+            window = reset if reset else self.window_seconds
+            self._refill()
+            # Without a reset header, assume the window started with the first
+            # response seen in it and leave the pending reset where it is
+            if reset or not self._window_reset_at:
+                self._window_reset_at = time.monotonic() + window
+            # Spread what is left of the quota over the rest of the window
+            self.rate = min(self.base_rate, remaining / window) if window > 0 else self.base_rate
+            self._tokens = min(self._tokens, remaining)
+        if status_code == 429:
+            retry_after = headers.get('retry-after')
+            try:
+                delay = float(retry_after) if retry_after else 1.0
+            except ValueError:
+                delay = 1.0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self._tokens = 0
+            logger.warning("%s rate limited, pausing for %.1fs", self.name, delay)
+
+def _scheduler(name: str, default_rate: float, default_burst: float, window_seconds: float) -> ProviderScheduler:
+    prefix = name.upper()
+    return ProviderScheduler(
+        name,
+        rate_per_second=float(os.getenv(f'{prefix}_RATE_PER_SECOND', str(default_rate))),
+        burst=float(os.getenv(f'{prefix}_RATE_BURST', str(default_burst))),
+        window_seconds=window_seconds,
+        workers=RATE_LIMIT_WORKERS
+    )
+
+# Defaults follow each provider's documented limits for the whole node; override
+# with <PROVIDER>_RATE_PER_SECOND / _RATE_BURST
+schedulers: Dict[str, ProviderScheduler] = {
+    'unsplash': _scheduler('unsplash', 5000 / 3600, 50, 3600),     # production: 5000 requests/hour
+    'tripadvisor': _scheduler('tripadvisor', 50, 50, 1),           # 50 calls/second
+    'openai': _scheduler('openai', 500 / 60, 20, 60),              # requests per minute
+}
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    return schedulers[provider]
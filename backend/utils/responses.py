@@ -0,0 +1,152 @@
+import os
+import gzip
+import json
+import asyncio
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from starlette.responses import Response
+
+# orjson and brotli are optional: without them responses fall back to the
+# stdlib json encoder and gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compression would not pay for itself
+COMPRESS_MIN_BYTES = int(os.getenv('ZOLA_COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('ZOLA_GZIP_LEVEL', '6'))
+# Brotli quality 4-5 compresses better than gzip -6 at a similar speed
+BROTLI_QUALITY = int(os.getenv('ZOLA_BROTLI_QUALITY', '4'))
+# Larger bodies are compressed on a worker thread instead of the event loop
+COMPRESS_THREAD_BYTES = 256 * 1024
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript')
+
+def _default(value: Any) -> Any:
+    # Image/Location models inside ZolaResponse.data: dump them once,
+    # without FastAPI's re-validation and jsonable_encoder walk
+    if isinstance(value, BaseModel):
+        return value.model_dump() if hasattr(value, 'model_dump') else value.dict()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content (which may contain pydantic models) as compact JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with dumps(). Returning a Response from an
+    endpoint makes FastAPI skip response_model validation and serialization.
+    """
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def zola_response(status: str, data: Dict[str, Any]) -> FastJSONResponse:
+    """
+    The {"status", "data"} ZolaResponse envelope, rendered on the fast path
+    """
+    return FastJSONResponse({'status': status, 'data': data})
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick br or gzip from an Accept-Encoding header, honouring q=0
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing single-chunk text/JSON responses with br or
+    gzip, whichever the client accepts. Streamed bodies (SSE, NDJSON, files)
+    and responses that already set Content-Encoding pass through untouched.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get('headers') or [])
+        encoding = _accepted_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message['type'] == 'http.response.start':
+                response_headers = {key.lower(): value for key, value in message.get('headers', [])}
+                content_type = response_headers.get(b'content-type', b'').decode('latin-1')
+                if b'content-encoding' in response_headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until we know whether the body is one chunk
+                    start_message = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            if message.get('more_body', False) or len(body) < COMPRESS_MIN_BYTES:
+                # Streamed or too small: send it as it is
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) >= COMPRESS_THREAD_BYTES:
+                compressed = await asyncio.to_thread(_compress, body, encoding)
+            else:
+                compressed = _compress(body, encoding)
+            response_headers = [
+                (key, value) for key, value in start_message.get('headers', [])
+                if key.lower() not in (b'content-length', b'vary')
+            ]
+            vary = [value for key, value in start_message.get('headers', []) if key.lower() == b'vary']
+            response_headers += [
+                (b'content-encoding', encoding.encode('latin-1')),
+                (b'content-length', str(len(compressed)).encode('latin-1')),
+                (b'vary', b', '.join(vary + [b'Accept-Encoding'])),
+            ]
+            await send({**start_message, 'headers': response_headers})
+            await send({**message, 'body': compressed})
+
+        await self.app(scope, receive, send_wrapper)
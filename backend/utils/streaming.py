@@ -0,0 +1,156 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+from utils.responses import dumps
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    Format one Server-Sent Events message with a JSON payload
+    """
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+def ndjson_line(data: Any) -> bytes:
+    """
+    Format one newline-delimited JSON record
+    """
+    return dumps(data) + b"\n"
+
+class ItineraryStreamParser:
+    """
+    Incremental parser for the {"itinerary": "...", "query_keywords": [...]}
+    envelope produced by the itinerary prompt.
+
+    Completion deltas are passed to feed(), which returns a list of events:
+      ("itinerary", markdown)  - decoded markdown, cut at paragraph/heading boundaries
+      ("keyword", keyword)     - each query keyword as soon as its string closes
+    close() flushes whatever markdown is left and exposes the parsed envelope.
+    """
+    def __init__(self):
+        self.raw = []
+        self.itinerary = []
+        self.keywords: List[str] = []
+        self._stack = []
+        self._expecting_key = False
+        self._in_string = False
+        self._string_is_key = False
+        self._string = []
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._key: Optional[str] = None
+        self._pending = ''
+
+    def _in_itinerary(self) -> bool:
+        return (self._in_string and not self._string_is_key
+                and len(self._stack) == 1 and self._key == 'itinerary')
+
+    def _append(self, char: str):
+        if self._in_itinerary():
+            self._pending += char
+        else:
+            self._string.append(char)
+
+    def _decode_escape(self, sequence: str):
+        if sequence[0] != 'u':
+            self._append(json.loads(f'"\\{sequence}"'))
+            return
+        code = int(sequence[1:], 16)
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._append(chr(code))
+
+    def _close_string(self, events: List[Tuple[str, str]]):
+        self._in_string = False
+        value = ''.join(self._string)
+        self._string = []
+        if self._string_is_key:
+            if len(self._stack) == 1:
+                self._key = value
+        elif len(self._stack) == 1 and self._key == 'itinerary':
+            self._flush(events, final=True)
+        elif len(self._stack) == 2 and self._stack[-1] == '[' and self._key == 'query_keywords':
+            self.keywords.append(value)
+            events.append(('keyword', value))
+
+    def _flush(self, events: List[Tuple[str, str]], final: bool = False):
+        """
+        Emit pending markdown up to the last complete block: a blank line or
+        the start of a new heading. Everything is emitted when final is set.
+        """
+        if final:
+            cut = len(self._pending)
+        else:
+            boundaries = [m.end() for m in re.finditer(r'\n\n+', self._pending)]
+            boundaries += [m.start() + 1 for m in re.finditer(r'\n(?=#{1,3} )', self._pending)]
+            boundaries = [b for b in boundaries if b < len(self._pending)]
+            cut = max(boundaries, default=0)
+        if cut > 0:
+            chunk, self._pending = self._pending[:cut], self._pending[cut:]
+            self.itinerary.append(chunk)
+            events.append(('itinerary', chunk))
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        events = []
+        self.raw.append(text)
+        for char in text:
+            if self._in_string:
+                if self._escape is not None:
+                    self._escape += char
+                    if self._escape[0] != 'u' or len(self._escape) == 5:
+                        self._decode_escape(self._escape)
+                        self._escape = None
+                elif char == '\\':
+                    self._escape = ''
+                elif char == '"':
+                    self._close_string(events)
+                else:
+                    self._append(char)
+            elif char == '"':
+                self._in_string = True
+                self._string_is_key = bool(self._stack) and self._stack[-1] == '{' and self._expecting_key
+            elif char in '{[':
+                self._stack.append(char)
+                self._expecting_key = char == '{'
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                self._expecting_key = False
+            elif char == ':':
+                self._expecting_key = False
+            elif char == ',' and self._stack and self._stack[-1] == '{':
+                self._expecting_key = True
+        if self._in_itinerary():
+            self._flush(events)
+        return events
+
+    def close(self) -> List[Tuple[str, str]]:
+        events = []
+        if self._pending:
+            self._flush(events, final=True)
+        return events
+
+    def parsed(self) -> Optional[dict]:
+        """
+        json.loads of the raw completion, or None when it is not a complete envelope
+        """
+        raw = ''.join(self.raw).strip()
+        raw = re.sub(r'^```(?:json)?\s*|\s*```$', '', raw)
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+    @property
+    def result(self) -> dict:
+        """
+        The full envelope: json.loads of the raw completion when it is valid,
+        otherwise whatever was recovered incrementally
+        """
+        parsed = self.parsed()
+        if parsed is not None:
+            return parsed
+        return {'itinerary': ''.join(self.itinerary), 'query_keywords': self.keywords}
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import time
+import queue
+import logging
+import threading
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# Spans are only recorded when something consumes them:
+#   ZOLA_TRACE_FILE           append OTLP/JSON traces to this file, one line per batch
+#   ZOLA_TRACE_OTLP_ENDPOINT  POST OTLP/JSON traces to a collector (e.g. http://localhost:4318/v1/traces)
+#   ZOLA_SERVER_TIMING=1      add a Server-Timing header summarising each request's spans
+TRACE_FILE = os.getenv('ZOLA_TRACE_FILE')
+TRACE_OTLP_ENDPOINT = os.getenv('ZOLA_TRACE_OTLP_ENDPOINT')
+SERVER_TIMING = os.getenv('ZOLA_SERVER_TIMING', '0') == '1'
+SERVICE_NAME = os.getenv('ZOLA_SERVICE_NAME', 'zola-backend')
+EXPORT_ENABLED = bool(TRACE_FILE or TRACE_OTLP_ENDPOINT)
+TRACING_ENABLED = EXPORT_ENABLED or SERVER_TIMING
+# Upper bound on traces waiting for export; newer traces are dropped beyond it
+EXPORT_QUEUE_SIZE = 1000
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+# stdlib logger: utils.log imports this module, handlers are set up there
+logger = logging.getLogger('zola.tracing')
+
+_TRACEPARENT = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+class Trace:
+    """
+    Spans recorded for one request (or one background job)
+    """
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: List['Span'] = []
+
+class Span:
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def start(self) -> 'Span':
+        self.start_ns = time.time_ns()
+        return self
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.spans.append(self)
+        # Root spans close the trace
+        if self.parent_id is None or self.kind == SERVER:
+            _export(self.trace)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> 'Span':
+        self.start()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.finish(exc)
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def start(self) -> '_NoopSpan':
+        return self
+
+    def finish(self, error: Optional[BaseException] = None):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+def span(name: str, kind: int = INTERNAL, **attributes):
+    """
+    Context manager recording a child of the current span, or the root of a
+    new trace when there is none. Returns a shared no-op when tracing is off.
+    """
+    if not TRACING_ENABLED:
+        return NOOP_SPAN
+    parent = _current_span.get()
+    if parent is None:
+        return Span(Trace(), name, None, kind, attributes)
+    return Span(parent.trace, name, parent.span_id, kind, attributes)
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+def activate(active):
+    """
+    Make active the current span; returns a token for deactivate()
+    """
+    if not isinstance(active, Span):
+        return None
+    return _current_span.set(active)
+
+def deactivate(token):
+    if token is not None:
+        _current_span.reset(token)
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def _otlp_span(recorded: Span) -> dict:
+    otlp = {
+        'traceId': recorded.trace.trace_id,
+        'spanId': recorded.span_id,
+        'name': recorded.name,
+        'kind': recorded.kind,
+        'startTimeUnixNano': str(recorded.start_ns),
+        'endTimeUnixNano': str(recorded.end_ns),
+        'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in recorded.attributes.items()],
+        'status': {'code': 2, 'message': recorded.error} if recorded.error else {'code': 1},
+    }
+    if recorded.parent_id:
+        otlp['parentSpanId'] = recorded.parent_id
+    return otlp
+
+def otlp_payload(traces: List[Trace]) -> dict:
+    """
+    OTLP/JSON ExportTraceServiceRequest for a batch of traces
+    """
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{
+            'scope': {'name': 'zola'},
+            'spans': [_otlp_span(recorded) for trace in traces for recorded in trace.spans],
+        }],
+    }]}
+
+_export_queue: 'queue.Queue[Trace]' = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+_export_thread: Optional[threading.Thread] = None
+
+def _export(trace: Trace):
+    """
+    Hand a finished trace to the exporter thread without blocking the request
+    """
+    global _export_thread
+    if not EXPORT_ENABLED:
+        return
+    if _export_thread is None or not _export_thread.is_alive():
+        _export_thread = threading.Thread(target=_export_loop, name='zola-trace-exporter', daemon=True)
+        _export_thread.start()
+    try:
+        _export_queue.put_nowait(trace)
+    except queue.Full:
+        pass
+
+def _export_loop():
+    while True:
+        batch = [_export_queue.get()]
+        while len(batch) < 100:
+            try:
+                batch.append(_export_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            logger.warning("Trace export failed: %s", e)
+
+def _write_batch(batch: List[Trace]):
+    body = json.dumps(otlp_payload(batch))
+    if TRACE_FILE:
+        with open(TRACE_FILE, 'a') as f:
+            f.write(body + '\n')
+    if TRACE_OTLP_ENDPOINT:
+        request = urllib.request.Request(
+            TRACE_OTLP_ENDPOINT, data=body.encode(), headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+def server_timing(trace: Trace, total_ms: Optional[float] = None) -> str:
+    """
+    Server-Timing header value: total duration per span name for the spans
+    finished so far, e.g. 'TripAdvisorAction._get_location_details;dur=812.3;desc="12 calls"'
+    """
+    totals: Dict[str, List[float]] = {}
+    for recorded in trace.spans:
+        if recorded.kind == SERVER:
+            continue
+        total = totals.setdefault(recorded.name, [0.0, 0])
+        total[0] += recorded.duration_ms
+        total[1] += 1
+    metrics = [
+        f'{re.sub(r"[^A-Za-z0-9_.-]", "_", name)};dur={duration:.1f};desc="{count} call{"s" if count != 1 else ""}"'
+        for name, (duration, count) in totals.items()
+    ]
+    if total_ms is not None:
+        metrics.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(metrics)
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every HTTP request (continuing
+    an incoming W3C traceparent) and, with ZOLA_SERVER_TIMING=1, adding a
+    Server-Timing header. For streamed responses the header is sent before
+    the body, so it only covers the work done until the first byte.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        incoming = _TRACEPARENT.match(headers.get(b'traceparent', b'').decode('latin-1'))
+        trace = Trace(incoming.group(1) if incoming else None)
+        root = Span(trace, f"{scope['method']} {scope['path']}", incoming.group(2) if incoming else None, SERVER, {
+            'http.method': scope['method'],
+            'http.target': scope['path'],
+        })
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                root.set_attribute('http.status_code', message['status'])
+                if SERVER_TIMING:
+                    elapsed_ms = (time.time_ns() - root.start_ns) / 1e6
+                    message = {**message, 'headers': [
+                        *message.get('headers', []),
+                        (b'server-timing', server_timing(trace, elapsed_ms).encode('latin-1')),
+                    ]}
+            await send(message)
+
+        error = None
+        root.start()
+        token = activate(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            deactivate(token)
+            route = getattr(scope.get('route'), 'path', None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute('http.route', route)
+            root.finish(error)
@@ -90,7 +90,7 @@ const ImageCard = ({
       {/* Image */}
       <div style={{ aspectRatio: aspectRatio }}>
         <img
-          src={currentImage.url}
+          src={currentImage.thumbUrl || currentImage.url}
           alt={currentImage.altText}
           className="w-full h-full object-cover transition-transform duration-300 hover:scale-105"
         />
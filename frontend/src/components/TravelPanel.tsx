@@ -22,10 +22,12 @@ import {
   setCurrentPlan,
   setItinerary,
   setLocations,
+  addLocation,
+  setLocationPhotos,
 } from "../store/slices/travelSlice";
 import { Plan } from "../types";
 import { deserializeDateRange, serializeDateRange } from "../utils/dateUtils";
-import { itineraryService, getLocationsService } from "../services";
+import { itineraryService } from "../services";
 import { imageService } from "../services/imageService";
 import LoadingPopup from "./LoadingPopup";
 
@@ -142,21 +144,18 @@ const TravelPanel = ({
     // Show loading popup
     setIsGenerating(true);
 
-    // Stay on loading screen until itinerary is ready
+    // Stay on loading screen until the itinerary starts arriving
 
     try {
-      // First, fetch tags for all pinned images
+      // First, fetch tags for all pinned images in one request
       const pinnedImages = currentPlan?.images || [];
-      const imagesWithTags = await Promise.all(
-        pinnedImages.map(async (image) => {
-          try {
-            const tags = await imageService.pinImage(image.id);
-            return { ...image, tags };
-          } catch (error) {
-            console.error(`Error fetching tags for image ${image.id}:`, error);
-            return image; // Return original image if tag fetching fails
-          }
-        })
+      const tagsById =
+        pinnedImages.length > 0
+          ? await imageService.pinImages(pinnedImages.map((image) => image.id))
+          : {};
+      // Keep an image's existing tags if none came back for it
+      const imagesWithTags = pinnedImages.map((image) =>
+        tagsById[image.id] ? { ...image, tags: tagsById[image.id] } : image
       );
 
       console.log("✅ Fetched tags for all pinned images");
@@ -175,65 +174,31 @@ const TravelPanel = ({
       // Update Redux state with images that have tags
       dispatch(setCurrentPlan(planData));
 
-      // Generate itinerary using the service
-      const result = await itineraryService.createItinerary(planData);
-
-      if (result && result.status === "success") {
-        console.log("Query keywords:", result.data["query_keywords"]);
-
-        // Call getLocationsService with query keywords
-        const queryKeywords = result.data["query_keywords"].slice(0, 3);
-        if (
-          queryKeywords &&
-          Array.isArray(queryKeywords) &&
-          queryKeywords.length > 0
-        ) {
-          console.log(
-            "Calling getLocationsService with queries:",
-            queryKeywords
-          );
-          const locationsResult = await getLocationsService.getLocations(
-            queryKeywords
-          );
-          console.log("GetLocationsService returned:", locationsResult);
-
-          // Set locations in global state if successful
-          if (
-            locationsResult &&
-            locationsResult.status === "success" &&
-            locationsResult.data.locations
-          ) {
-            // Filter out duplicate locations based on locationId
-            const uniqueLocations = locationsResult.data.locations.filter(
-              (location, index, self) =>
-                index ===
-                self.findIndex((l) => l.location_id === location.location_id)
-            );
-
-            console.log(
-              "Original locations count:",
-              locationsResult.data.locations.length
-            );
-            console.log("Unique locations count:", uniqueLocations.length);
-            console.log(
-              "Setting unique locations in global state:",
-              uniqueLocations
-            );
-
-            dispatch(setLocations(uniqueLocations));
-          } else {
-            console.error(
-              "Failed to fetch locations:",
-              locationsResult?.data?.error
-            );
+      // Generate the itinerary and its locations on one stream. The loading
+      // popup only waits for the first itinerary chunk; the rest of the
+      // markdown, location cards and photos fill in on the itinerary page
+      dispatch(setLocations([]));
+      let itinerary = "";
+      let navigated = false;
+      await itineraryService.planTrip(
+        planData,
+        (markdown) => {
+          itinerary += markdown;
+          dispatch(setItinerary(itinerary));
+          if (!navigated) {
+            navigated = true;
+            setIsGenerating(false);
+            navigate("/itinerary");
           }
-        }
+        },
+        (location) => dispatch(addLocation(location)),
+        (keywords) => console.log("Query keywords:", keywords),
+        (locationId, photoUrl) =>
+          dispatch(setLocationPhotos({ [locationId]: photoUrl }))
+      );
 
-        dispatch(setItinerary(result.data["itinerary"]));
-        // Navigate after itinerary is ready
-        navigate("/itinerary");
-      } else {
-        console.error("Failed to generate itinerary:", result?.data?.error);
+      if (!itinerary) {
+        console.error("Failed to generate itinerary: empty response");
       }
     } catch (error) {
       console.error("Error generating itinerary:", error);
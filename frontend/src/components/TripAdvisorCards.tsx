@@ -211,13 +211,19 @@ const TripAdvisorCards: React.FC<TripAdvisorCardsProps> = ({
             <div className="flex">
               {/* Image */}
               <div className="w-32 h-24 flex-shrink-0">
-                <img
-                  src={
-                    location.photo_url || "https://via.placeholder.com/128x96"
-                  }
-                  alt={location.name}
-                  className="w-full h-full object-cover"
-                />
+                {/* Photos are resolved after the card text, so show a placeholder until then */}
+                {location.photo_url ? (
+                  <img
+                    src={location.photo_url}
+                    alt={location.name}
+                    loading="lazy"
+                    className="w-full h-full object-cover"
+                  />
+                ) : (
+                  <div className="w-full h-full bg-gray-100 flex items-center justify-center">
+                    <Camera className="h-6 w-6 text-gray-300" />
+                  </div>
+                )}
               </div>
 
               {/* Content */}
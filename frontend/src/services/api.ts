@@ -1,5 +1,5 @@
 // Base API configuration
-const API_BASE_URL = "http://localhost:8000";
+export const API_BASE_URL = "http://localhost:8000";
 
 // Generic API call function
 const apiCall = async (endpoint: string, options: RequestInit = {}) => {
@@ -24,4 +24,76 @@ const apiCall = async (endpoint: string, options: RequestInit = {}) => {
   }
 };
 
+// Read a Server-Sent Events response, calling onEvent for every message
+export const streamEvents = async (
+  endpoint: string,
+  options: RequestInit,
+  onEvent: (event: string, data: any) => void,
+) => {
+  const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+    headers: {
+      "Content-Type": "application/json",
+      ...options.headers,
+    },
+    ...options,
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = message.match(/^event: (.*)$/m)?.[1] ?? "message";
+      const data = message.match(/^data: (.*)$/m)?.[1];
+      if (data !== undefined) onEvent(event, JSON.parse(data));
+      boundary = buffer.indexOf("\n\n");
+    }
+  }
+};
+
+// Read a newline-delimited JSON response, calling onRecord for every line
+export const streamLines = async (
+  endpoint: string,
+  options: RequestInit,
+  onRecord: (record: any) => void,
+) => {
+  const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+    headers: {
+      "Content-Type": "application/json",
+      ...options.headers,
+    },
+    ...options,
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline = buffer.indexOf("\n");
+    while (newline !== -1) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onRecord(JSON.parse(line));
+      newline = buffer.indexOf("\n");
+    }
+  }
+};
+
 export default apiCall;
@@ -1,4 +1,5 @@
-import apiCall from "./api";
+import apiCall, { streamLines } from "./api";
+import { TripAdvisorLocation } from "../types";
 
 // Get locations service for TripAdvisor data
 export const getLocationsService = {
@@ -28,6 +29,53 @@ export const getLocationsService = {
     }
   },
 
+  // Stream locations as each one is fetched, whichever query finishes first;
+  // resolves with the final total_count once every query is done
+  streamLocations: async (
+    queries: string[],
+    onLocation: (location: TripAdvisorLocation) => void,
+  ): Promise<number | null> => {
+    let totalCount: number | null = null;
+    try {
+      await streamLines(
+        "/get-locations/stream",
+        {
+          method: "POST",
+          body: JSON.stringify({ queries }),
+        },
+        (record) => {
+          if (record.type === "location") onLocation(record.location);
+          else if (record.type === "done") totalCount = record.total_count;
+          else if (record.type === "error") throw new Error(record.error);
+        },
+      );
+    } catch (error) {
+      console.error("StreamLocations API call failed:", error);
+    }
+    return totalCount;
+  },
+
+  // Resolve photos for locations returned without one; null means no photo
+  getLocationPhotos: async (
+    locationIds: string[]
+  ): Promise<Record<string, string | null> | null> => {
+    try {
+      const data = await apiCall("/location-photos", {
+        method: "POST",
+        body: JSON.stringify({ locationIds }),
+      });
+
+      if (data.status === "success") {
+        return data.data.photos;
+      }
+      console.error("Error fetching location photos:", data.data.error);
+      return null;
+    } catch (error) {
+      console.error("LocationPhotos API call failed:", error);
+      return null;
+    }
+  },
+
   // Test function with sample queries
   testGetLocations: async () => {
     const testQueries = [
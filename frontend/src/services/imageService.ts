@@ -81,4 +81,23 @@ export const imageService = {
       return [];
     }
   },
+
+  // Pin many images in one request; returns tags keyed by image ID
+  pinImages: async (imageIds: string[]): Promise<Record<string, string[]>> => {
+    try {
+      const data = await apiCall("/pin-images", {
+        method: "POST",
+        body: JSON.stringify({ imageIds }),
+      });
+      if (data.status === "success" && data.data.tags) {
+        return data.data.tags;
+      } else {
+        console.error("Error pinning images:", data.data.error);
+        return {};
+      }
+    } catch (error) {
+      console.error("PinImages API call failed:", error);
+      return {};
+    }
+  },
 };
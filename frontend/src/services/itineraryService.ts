@@ -1,16 +1,16 @@
-import apiCall from "./api";
-import { Plan } from "../types";
+import apiCall, { streamEvents } from "./api";
+import { Plan, TripAdvisorLocation } from "../types";
 
 // Itinerary service for travel planning
 export const itineraryService = {
-  // Create itinerary based on plan data
-  createItinerary: async (planData: Plan) => {
+  // Create itinerary based on plan data; pass noCache to skip the server-side itinerary cache
+  createItinerary: async (planData: Plan, noCache: boolean = false) => {
     try {
       console.log("Calling createItinerary endpoint with plan data:", planData);
 
       const data = await apiCall("/create-itinerary", {
         method: "POST",
-        body: JSON.stringify(planData),
+        body: JSON.stringify(noCache ? { ...planData, noCache } : planData),
       });
 
       console.log("CreateItinerary Response:", data);
@@ -28,6 +28,54 @@ export const itineraryService = {
     }
   },
 
+  // Stream an itinerary: onMarkdown gets each markdown chunk as it is generated,
+  // onKeywords gets the final query keywords
+  streamItinerary: async (
+    planData: Plan,
+    onMarkdown: (markdown: string) => void,
+    onKeywords: (keywords: string[]) => void,
+    noCache: boolean = false,
+  ) => {
+    await streamEvents(
+      "/create-itinerary/stream",
+      {
+        method: "POST",
+        body: JSON.stringify(noCache ? { ...planData, noCache } : planData),
+      },
+      (event, data) => {
+        if (event === "itinerary") onMarkdown(data.markdown);
+        else if (event === "keywords") onKeywords(data.query_keywords);
+        else if (event === "error") throw new Error(data.error);
+      },
+    );
+  },
+
+  // Generate the itinerary and its TripAdvisor locations on one stream;
+  // locations arrive while the itinerary is still being written
+  planTrip: async (
+    planData: Plan,
+    onMarkdown: (markdown: string) => void,
+    onLocation: (location: TripAdvisorLocation) => void,
+    onKeywords: (keywords: string[]) => void = () => {},
+    onPhoto: (locationId: string, photoUrl: string) => void = () => {},
+    noCache: boolean = false,
+  ) => {
+    await streamEvents(
+      "/plan-trip",
+      {
+        method: "POST",
+        body: JSON.stringify(noCache ? { ...planData, noCache } : planData),
+      },
+      (event, data) => {
+        if (event === "itinerary") onMarkdown(data.markdown);
+        else if (event === "location") onLocation(data);
+        else if (event === "keywords") onKeywords(data.query_keywords);
+        else if (event === "photo") onPhoto(data.location_id, data.photo_url);
+        else if (event === "error") throw new Error(data.error);
+      },
+    );
+  },
+
   // Test function with fake data
   testCreateItinerary: async () => {
     const fakePlanData: Plan = {
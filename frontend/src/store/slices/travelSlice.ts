@@ -75,6 +75,25 @@ const travelSlice = createSlice({
         state.currentPlan.locations = action.payload;
       }
     },
+    // Append one streamed location, skipping ones already shown
+    addLocation: (state, action: PayloadAction<TripAdvisorLocation>) => {
+      if (!state.currentPlan) return;
+      const locations = state.currentPlan.locations ?? [];
+      if (!locations.some((l) => l.location_id === action.payload.location_id)) {
+        state.currentPlan.locations = [...locations, action.payload];
+      }
+    },
+    // Fill in photos resolved after the locations were shown (location_id -> url)
+    setLocationPhotos: (
+      state,
+      action: PayloadAction<Record<string, string | null>>
+    ) => {
+      state.currentPlan?.locations?.forEach((location) => {
+        if (action.payload[location.location_id] !== undefined) {
+          location.photo_url = action.payload[location.location_id];
+        }
+      });
+    },
   },
 });
 
@@ -90,6 +109,8 @@ export const {
   removeImageFromCurrentPlan,
   setItinerary,
   setLocations,
+  addLocation,
+  setLocationPhotos,
 } = travelSlice.actions;
 
 export default travelSlice.reducer;
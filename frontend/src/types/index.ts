@@ -4,6 +4,9 @@ export interface Image {
   description: string;
   altText: string;
   tags: string[];
+  // Resized variants served by the backend for pooled images
+  thumbUrl?: string | null;
+  mediumUrl?: string | null;
 }
 
 export interface Plan {